@@ -0,0 +1,208 @@
+### batch scoring of transaction files
+# streams a csv through the served model chunk by chunk, so memory stays at a few chunks no matter
+# how big the file is, and writes every row back out with 'prediction' and 'score' columns.
+# usage: python batch_score.py transactions.csv predictions.csv [--chunk-rows 100000] [--workers 4] [--version v0003]
+# the same scoring is available over http as POST /api/score on the dashboard server (see register_routes).
+
+# argparse, collections, concurrent.futures, itertools, json, sys, time (standard library)
+import argparse
+import collections
+import itertools
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# numpy (needed to be installed via pip or the like)
+import numpy as np
+
+# pandas (needed to be installed via pip or the like)
+import pandas as pd
+
+import dataset_cache
+import features
+import instrumentation
+import model_store
+from streaming_stats import StreamingStats
+
+DEFAULT_CHUNK_ROWS = 100000
+
+
+def feature_matrix(chunk, feature_columns):
+    # the model's feature columns as one float32 array; derived features ('hour', ...) are computed
+    # from a raw 'Time' column when the input does not carry them already
+    missing = [col for col in feature_columns if col not in chunk.columns]
+    derivable = [col for col in missing if col in features.FEATURES]
+    if derivable and 'Time' in chunk.columns:
+        chunk = chunk.assign(**features.derive(chunk['Time'].values, derivable))
+        missing = [col for col in missing if col not in derivable]
+    if missing:
+        raise ValueError('input is missing column(s): %s' % ', '.join(missing))
+    x = np.ascontiguousarray(chunk[feature_columns].values, dtype=np.float32)
+    bad = ~np.isfinite(x).all(axis=1) # a missing or infinite value would score as 'legit' (NaN > 0 is False): refuse it
+    if bad.any():
+        raise ValueError('%d row(s) with a missing or non-finite value, e.g. row(s) %s'
+                         % (bad.sum(), ', '.join(str(row) for row in chunk.index[bad][:5])))
+    return x
+
+
+def score_chunk(chunk, scorer, feature_columns, keep_input=True):
+    # the chunk with two extra columns: the predicted class and the decision score
+    # (keep_input=False returns just those two columns, in the same row order)
+    labels, scores = scorer.score(feature_matrix(chunk, feature_columns))
+    if not keep_input:
+        return pd.DataFrame({'prediction': labels, 'score': scores})
+    return chunk.assign(prediction=labels, score=scores)
+
+
+def score_csv_chunk(chunk, scorer, feature_columns, header, keep_input=True):
+    # scored chunk already formatted as csv text (formatting is the slowest step, so it is done where the scoring is)
+    return len(chunk), score_chunk(chunk, scorer, feature_columns, keep_input).to_csv(None, header=header, index=False)
+
+
+### process pool workers: each one loads the artifact once and then only receives chunks
+_worker_artifact = None
+
+
+def _init_worker(version, model_dir):
+    global _worker_artifact
+    _worker_artifact = model_store.load_artifact(version, model_dir)
+
+
+def _score_in_worker(chunk, header, keep_input):
+    return score_csv_chunk(chunk, _worker_artifact.scorer, _worker_artifact.feature_columns, header, keep_input)
+
+
+def score_csv_stream(chunks, artifact, workers=0, model_dir=model_store.DEFAULT_MODEL_DIR, keep_input=True):
+    # yields (rows, csv text) per chunk in input order, the first one with the header line; with workers > 0
+    # the chunks are spread over a process pool, keeping at most 2 chunks per worker in flight so memory stays bounded
+    if workers <= 0:
+        for i, chunk in enumerate(chunks):
+            yield score_csv_chunk(chunk, artifact.scorer, artifact.feature_columns, i == 0, keep_input)
+        return
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(artifact.version, model_dir)) as pool:
+        pending = collections.deque()
+        for i, chunk in enumerate(chunks):
+            pending.append(pool.submit(_score_in_worker, chunk, i == 0, keep_input))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _feed_stats(chunks, stats):
+    # pass chunks through unchanged while folding them into a StreamingStats
+    for chunk in chunks:
+        stats.update_frame(chunk)
+        yield chunk
+
+
+def score_file(input_path, output_path, artifact, chunk_rows=DEFAULT_CHUNK_ROWS, workers=0,
+               model_dir=model_store.DEFAULT_MODEL_DIR, keep_input=True, stats=None):
+    # score 'input_path' into 'output_path'; returns (rows, seconds).
+    # with 'stats' (a StreamingStats) every chunk is also added to the running statistics
+    start = time.perf_counter()
+    rows = 0
+    chunks = pd.read_csv(input_path, chunksize=chunk_rows)
+    if stats is not None:
+        chunks = _feed_stats(chunks, stats)
+    with open(output_path, 'w', newline='') as out:
+        for chunk_rows_done, text in score_csv_stream(chunks, artifact, workers, model_dir, keep_input):
+            out.write(text)
+            rows += chunk_rows_done
+    return rows, time.perf_counter() - start
+
+
+### http endpoint on the dashboard's flask server
+def _records_frame(payload):
+    # accepts [{"V1": ..}, ..], {"records": [..]} or {"columns": [..], "data": [[..], ..]}
+    if isinstance(payload, dict) and 'columns' in payload:
+        return pd.DataFrame(payload['data'], columns=payload['columns'])
+    if isinstance(payload, dict):
+        payload = payload.get('records', [payload])
+    return pd.DataFrame.from_records(payload)
+
+
+def register_routes(server, current_artifact, chunk_rows=DEFAULT_CHUNK_ROWS):
+    # POST /api/score
+    #   Content-Type: text/csv          -> streamed csv back, the input rows plus 'prediction' and 'score'
+    #   Content-Type: application/json  -> {"model_version", "predictions", "scores", "rows", "rows_per_second"}
+    # 'current_artifact' is a function returning the artifact to score with (e.g. ModelWatcher.current)
+    import flask
+
+    @server.route('/api/score', methods=['POST'])
+    def api_score():
+        artifact = current_artifact()
+        if flask.request.mimetype == 'text/csv':
+            try: # check the first chunk before the 200 goes out; later errors can only cut the stream short
+                chunks = pd.read_csv(flask.request.stream, chunksize=chunk_rows)
+                first = next(chunks)
+                feature_matrix(first, artifact.feature_columns)
+            except (ValueError, StopIteration) as e: # pandas' EmptyDataError and ParserError are ValueErrors
+                return flask.Response(json.dumps({'error': str(e) or 'no rows to score'}), status=400,
+                                      mimetype='application/json')
+            def generate():
+                for rows, text in score_csv_stream(itertools.chain([first], chunks), artifact):
+                    instrumentation.count_scored('score_api_csv', rows)
+                    yield text
+            response = flask.Response(flask.stream_with_context(generate()), mimetype='text/csv')
+            response.headers['X-Model-Version'] = artifact.version
+            return response
+
+        payload = flask.request.get_json(silent=True)
+        if payload is None:
+            return flask.Response(json.dumps({'error': 'send text/csv or a JSON list of transactions'}),
+                                  status=400, mimetype='application/json')
+        start = time.perf_counter()
+        try:
+            with instrumentation.timed('score_api'):
+                labels, scores = artifact.scorer.score(feature_matrix(_records_frame(payload), artifact.feature_columns))
+        except (ValueError, KeyError, TypeError) as e:
+            return flask.Response(json.dumps({'error': str(e)}), status=400, mimetype='application/json')
+        seconds = time.perf_counter() - start
+        instrumentation.count_scored('score_api', len(labels))
+        return flask.jsonify({
+            'model_version': artifact.version,
+            'predictions': labels.tolist(),
+            'scores': scores.tolist(),
+            'rows': len(labels),
+            'rows_per_second': len(labels) / seconds if seconds > 0 else None,
+        })
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Score a csv of transactions with the trained model.')
+    parser.add_argument('input', help='csv with V1..V28, Amount and either hour or Time')
+    parser.add_argument('output', help='where to write the scored csv')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS, help='rows per chunk (bounds memory)')
+    parser.add_argument('--workers', type=int, default=0, help='score chunks in this many processes (0 = in this process)')
+    parser.add_argument('--scores-only', action='store_true', help='write only the prediction and score columns (much less csv to format)')
+    parser.add_argument('--stats', default=None, help='also add the input to this streaming statistics file (created or merged into)')
+    parser.add_argument('--version', default=None, help='model version to use (default: LATEST)')
+    parser.add_argument('--model-dir', default=model_store.DEFAULT_MODEL_DIR, help='artifact directory')
+    args = parser.parse_args(argv)
+
+    artifact = model_store.load_artifact(args.version, args.model_dir)
+    if artifact is None:
+        parser.error('no trained model in %s, run train_model.py first' % args.model_dir)
+    stats = None
+    if args.stats:
+        try:
+            stats = StreamingStats.load(args.stats)
+        except OSError: # same columns as the dashboard's data, without 'Class' if the input is unlabelled
+            labelled = 'Class' in pd.read_csv(args.input, nrows=0).columns
+            stats = StreamingStats([col for col in dataset_cache.FRAME_COLUMNS if labelled or col != 'Class'])
+    try:
+        rows, seconds = score_file(args.input, args.output, artifact, args.chunk_rows, args.workers, args.model_dir,
+                                   keep_input=not args.scores_only, stats=stats)
+    except ValueError as e: # bad input: say which rows, not a traceback (the output stops before the first bad chunk)
+        parser.error(str(e))
+    if stats is not None:
+        stats.save(args.stats)
+    print('scored %d rows with %s in %.2fs (%.0f rows/sec)' % (rows, artifact.version, seconds, rows / max(seconds, 1e-9)),
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
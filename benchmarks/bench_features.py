@@ -0,0 +1,54 @@
+### benchmark: per-row datetime apply vs. vectorised feature derivation
+# usage: python benchmarks/bench_features.py [rows ...]   (defaults to 1M and 10M rows)
+
+# datetime, os, sys, time (standard library)
+import datetime
+import os
+import sys
+import time
+
+# numpy and pandas (needed to be installed via pip or the like)
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import features
+
+
+def convert(seconds):
+    return datetime.datetime.utcfromtimestamp(seconds)
+
+
+def per_row_hour(time_column):
+    # what fraud_detection_svc.py used to do
+    return time_column.apply(convert).dt.hour.values
+
+
+def vectorised_hour(time_column):
+    return features.derive(time_column.values, ('hour',))['hour']
+
+
+def run(rows):
+    rng = np.random.RandomState(0)
+    time_column = pd.Series(np.sort(rng.randint(0, 172800, rows)).astype(np.float64)) # two days of seconds, like creditcard.csv
+
+    start = time.perf_counter()
+    expected = per_row_hour(time_column)
+    apply_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    got = vectorised_hour(time_column)
+    vector_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    features.derive(time_column.values, sorted(features.FEATURES)) # every registered feature at once
+    all_seconds = time.perf_counter() - start
+
+    assert (expected == got).all(), 'vectorised hour differs from datetime.utcfromtimestamp'
+    print('%10d rows | apply %8.3fs | vectorised hour %8.4fs (%6.0fx) | all %d features %8.4fs'
+          % (rows, apply_seconds, vector_seconds, apply_seconds / vector_seconds, len(features.FEATURES), all_seconds))
+
+
+if __name__ == '__main__':
+    for rows in [int(arg) for arg in sys.argv[1:]] or [1000000, 10000000]:
+        run(rows)
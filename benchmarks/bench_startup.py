@@ -0,0 +1,61 @@
+### benchmark: start-up time of the scoring-only path and of the full dashboard
+# every measurement is a fresh python process (interpreter start included), so it is what a worker restart,
+# a CLI call or a test pays. reports the median wall time and which heavy libraries each path imported.
+# usage: python benchmarks/bench_startup.py [--runs 5]
+# reads the dataset and models the app uses (creditcard.csv or $CREDITCARD_CSV, models/ or $FRAUD_MODEL_DIR);
+# one untimed dashboard start first builds whatever is missing (cache, model, stats).
+
+# argparse, json, os, statistics, subprocess, sys, time (standard library)
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+HEAVY = ('pandas', 'sklearn', 'plotly', 'dash', 'flask')
+
+PATHS = [ # (name, code run in the fresh process)
+    ('scoring: import scoring_service', 'import scoring_service'),
+    ('scoring: load model + score one', 'import scoring_service, model_store\n'
+                                        'artifact = model_store.load_artifact()\n'
+                                        'artifact.scorer.score_one([0.0] * len(artifact.feature_columns))'),
+    ('dashboard: import', 'import fraud_detection_svc'),
+    ('dashboard: create_app (lazy)', 'import fraud_detection_svc\nfraud_detection_svc.create_app()'),
+    ('dashboard: create_app (warm)', 'import fraud_detection_svc\nfraud_detection_svc.create_app(warm=True)'),
+    ('dashboard: warm + every tab', 'import fraud_detection_svc\napp = fraud_detection_svc.create_app(warm=True)\n'
+                                    'for tab in ("tab-1", "tab-2", "tab-3"):\n'
+                                    '    fraud_detection_svc.render_content(app.resources, tab)'),
+]
+
+REPORT = '\nimport json, sys\nprint(json.dumps(sorted(m for m in %r if m in sys.modules)))' % (HEAVY,)
+
+
+def run(code):
+    # wall seconds of a fresh interpreter running 'code', and the heavy libraries it imported
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, '-c', code + REPORT], cwd=ROOT, stdout=subprocess.PIPE,
+                         stderr=subprocess.DEVNULL, check=True)
+    seconds = time.perf_counter() - start
+    return seconds, json.loads(out.stdout.decode().strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Measure start-up time of the scoring path and the dashboard.')
+    parser.add_argument('--runs', type=int, default=5, help='fresh processes per path; the median is reported')
+    args = parser.parse_args(argv)
+
+    run(dict(PATHS)['dashboard: warm + every tab']) # build cache, model and stats once, untimed
+    baseline, _ = min(run('pass') for _ in range(args.runs)) # the bare interpreter, for reference
+    print('%-34s %9s  %s' % ('path', 'median s', 'heavy imports'))
+    print('%-34s %9.3f' % ('python -c pass', baseline))
+    for name, code in PATHS:
+        results = [run(code) for _ in range(args.runs)]
+        print('%-34s %9.3f  %s' % (name, statistics.median(s for s, _ in results), ', '.join(results[0][1]) or '-'))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,49 @@
+### benchmark: fit time and full-data confusion matrix per training backend and sample size
+# usage: python benchmarks/bench_training.py [--sizes 600,50000,285000] [--backends svc,linear_svm,sgd] [--svc-max 50000]
+# reads the dataset the app uses (creditcard.csv or $CREDITCARD_CSV). sizes above the data size mean "every row".
+
+# argparse, os, sys, time (standard library)
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import dataset_cache
+import train_model
+import training
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare training backends by fit time and confusion matrix.')
+    parser.add_argument('--sizes', default='600,50000,285000', help='training rows to try')
+    parser.add_argument('--backends', default='svc,linear_svm,sgd')
+    parser.add_argument('--svc-max', type=int, default=50000, help='skip the kernel SVC above this many rows')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    dataset = dataset_cache.load_dataset()
+    x, y = dataset.x, dataset.y
+    classes = (dataset.legit, dataset.fraud)
+    print('%-11s %8s %9s %9s %9s %9s %9s %9s' % ('backend', 'rows', 'fit s', 'TN', 'FP', 'FN', 'TP', 'recall'))
+    for size in [int(s) for s in args.sizes.split(',')]:
+        for backend in args.backends.split(','):
+            if backend == 'svc':
+                if size > args.svc_max:
+                    print('%-11s %8d   skipped (--svc-max %d)' % (backend, size, args.svc_max))
+                    continue
+                n_fraud = min(len(dataset.fraud), size // 2) # the original recipe: all the fraud we can get, legit fills up
+                rows = training.sample_indices(y, args.seed, n_fraud, size - n_fraud, classes)
+            else:
+                rows = training.stratified_indices(y, size, args.seed, classes)
+            start = time.perf_counter()
+            model = training.fit(backend, x, y, rows, args.seed)
+            seconds = time.perf_counter() - start
+            metrics = train_model.evaluate(model, x, y)
+            (tn, fp), (fn, tp) = metrics['confusion_matrix']
+            print('%-11s %8d %9.3f %9d %9d %9d %9d %8.2f%%' % (backend, len(rows), seconds, tn, fp, fn, tp, metrics['recall'] * 100))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,121 @@
+### load generator for scoring_service.py
+# shows the throughput / tail-latency trade-off of request coalescing.
+#   in-process (no network, compares batching settings against one score per request):
+#     python benchmarks/loadgen.py --concurrency 256 --requests 50000 --windows 0,0.5,1,2
+#   against a running service:
+#     python benchmarks/loadgen.py --url http://127.0.0.1:8060 --concurrency 64 --requests 20000
+
+# argparse, asyncio, json, os, sys, time (standard library)
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+# numpy (needed to be installed via pip or the like)
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import model_store
+import scoring_service
+
+
+def random_rows(n_features, count, seed=0):
+    return np.random.RandomState(seed).normal(size=(count, n_features)).tolist()
+
+
+def report(label, latencies, seconds):
+    p50, p99, p999 = np.percentile(np.asarray(latencies) * 1000.0, [50, 99, 99.9])
+    print('%-28s %9.0f req/s   p50 %7.3fms   p99 %7.3fms   p99.9 %7.3fms'
+          % (label, len(latencies) / seconds, p50, p99, p999))
+
+
+async def _drive(score, rows, concurrency):
+    # 'concurrency' clients sending requests back to back until all rows are scored; returns (latencies, seconds)
+    latencies = []
+    position = iter(range(len(rows)))
+
+    async def client():
+        for i in position:
+            start = time.perf_counter()
+            await score(rows[i])
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(concurrency)])
+    return latencies, time.perf_counter() - start
+
+
+async def in_process(args):
+    watcher = model_store.ModelWatcher(args.model_dir)
+    if watcher.current() is None:
+        sys.exit('no trained model in %s, run train_model.py first' % args.model_dir)
+    rows = random_rows(watcher.current().scorer.n_features, args.requests)
+
+    # baseline: every request scored on its own, like one predict per request
+    batcher = scoring_service.MicroBatcher(watcher.current, window=0, max_rows=1)
+    report('one row per call', *(await _drive(batcher.score, rows, args.concurrency)))
+    await batcher.stop()
+
+    for window_ms in [float(w) for w in args.windows.split(',')]:
+        batcher = scoring_service.MicroBatcher(watcher.current, window=window_ms / 1000.0, max_rows=args.max_rows)
+        latencies, seconds = await _drive(batcher.score, rows, args.concurrency)
+        report('window %.2fms, max %d rows' % (window_ms, args.max_rows), latencies, seconds)
+        await batcher.stop()
+
+
+async def over_http(args):
+    host, _, port = args.url.split('://', 1)[-1].rstrip('/').partition(':')
+    rows = random_rows(args.features, args.requests)
+
+    async def client_factory():
+        reader, writer = await asyncio.open_connection(host, int(port or 80))
+
+        async def score(row):
+            body = json.dumps({'features': row}).encode()
+            writer.write(b'POST /score HTTP/1.1\r\nHost: %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n%s'
+                         % (host.encode(), len(body), body))
+            await writer.drain()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b''):
+                    break
+                if line.lower().startswith(b'content-length:'):
+                    length = int(line.split(b':')[1])
+            await reader.readexactly(length)
+        return score
+
+    # one keep-alive connection per simulated client
+    scores = [await client_factory() for _ in range(args.concurrency)]
+    latencies = []
+    position = iter(range(len(rows)))
+
+    async def client(score):
+        for i in position:
+            start = time.perf_counter()
+            await score(rows[i])
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client(score) for score in scores])
+    report('%s, %d connections' % (args.url, args.concurrency), latencies, time.perf_counter() - start)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load generator for the micro-batching scoring service.')
+    parser.add_argument('--url', default=None, help='score against a running service instead of in-process')
+    parser.add_argument('--concurrency', type=int, default=256, help='concurrent clients')
+    parser.add_argument('--requests', type=int, default=50000, help='total requests')
+    parser.add_argument('--windows', default='0,0.5,1,2', help='in-process: batching windows to compare, in ms')
+    parser.add_argument('--max-rows', type=int, default=256, help='in-process: max rows per batch')
+    parser.add_argument('--features', type=int, default=30, help='http: features per transaction')
+    parser.add_argument('--model-dir', default=model_store.DEFAULT_MODEL_DIR, help='in-process: artifact directory')
+    args = parser.parse_args(argv)
+    asyncio.run(over_http(args) if args.url else in_process(args))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,339 @@
+### benchmark harness for the app's hot paths
+# runs every stage against synthetic creditcard.csv-shaped data (see synthetic.py) at each size and
+# records wall time, peak RSS and rows/sec as json, so two runs can be compared.
+# each (stage, size) runs in a fresh python process: timings don't share warm caches and peak RSS is the stage's own.
+# usage: python benchmarks/run_benchmarks.py [--sizes 10000,285000,5000000] [--stages load,hour,...] [--out benchmarks/results/<time>.json]
+#        python benchmarks/run_benchmarks.py --compare old.json new.json
+# stages whose name starts with 'legacy' reproduce what fraud_detection_svc.py used to do; they are slow on
+# big inputs and skipped above --legacy-max-rows.
+
+# argparse, datetime, json, os, platform, resource, subprocess, sys, tempfile, time (standard library)
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.join(HERE, os.pardir)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+DEFAULT_SIZES = '10000,285000,5000000'
+
+
+### peak memory of this process, reset before each timed stage where the kernel allows it
+def reset_peak_rss():
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5') # linux >= 4.0: reset the 'VmHWM' high-water mark
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024.0 * 1024.0) if sys.platform == 'darwin' else peak / 1024.0 # bytes on macOS, KB elsewhere
+
+
+### stages: setup(ctx) does the untimed preparation and returns the function to time
+class Context(object):
+    def __init__(self, csv_path, rows, work_dir):
+        self.csv_path = csv_path
+        self.rows = rows
+        self.work_dir = work_dir # scratch space for caches and models of this size
+        self.cache_dir = os.path.join(work_dir, 'cache')
+        self.model_dir = os.path.join(work_dir, 'models')
+
+    def legacy_frame(self):
+        # the data frame the original script built: python-engine parse (float64), per-row datetime for 'hour'
+        import datetime as dt
+        import pandas as pd
+        df = pd.read_csv(self.csv_path, engine='python')
+        df['Datetime'] = df.Time.apply(dt.datetime.utcfromtimestamp)
+        df['hour'] = df.Datetime.dt.hour
+        return df.drop(['Time', 'Datetime'], axis=1)
+
+    def dataset(self):
+        import dataset_cache
+        return dataset_cache.load_dataset(self.csv_path, self.cache_dir)
+
+    def features(self, frame):
+        import numpy as np
+        return np.ascontiguousarray(frame[[c for c in frame.columns if c != 'Class']].values), frame['Class'].values
+
+    def dashboard_env(self):
+        return dict(os.environ, CREDITCARD_CSV=self.csv_path, FRAUD_CACHE_DIR=self.cache_dir, FRAUD_MODEL_DIR=self.model_dir)
+
+
+def legacy_load(ctx):
+    import pandas as pd
+    return lambda: pd.read_csv(ctx.csv_path, engine='python')
+
+
+def load_cache_build(ctx):
+    import dataset_cache
+    # a new directory every run: a second build into the same one would only stat() the csv and return.
+    # the builds are removed with the work dir after the stage
+    return lambda: dataset_cache.ensure_cache(ctx.csv_path, tempfile.mkdtemp(dir=ctx.work_dir))
+
+
+def load_cache_open(ctx):
+    import dataset_cache
+    dataset_cache.ensure_cache(ctx.csv_path, ctx.cache_dir)
+    return lambda: dataset_cache.load_dataset(ctx.csv_path, ctx.cache_dir)
+
+
+def legacy_hour(ctx):
+    import datetime as dt
+    time_column = _time_column(ctx)
+    return lambda: time_column.apply(lambda s: dt.datetime.utcfromtimestamp(s)).dt.hour
+
+
+def hour_vectorised(ctx):
+    import features
+    time_column = _time_column(ctx)
+    return lambda: features.derive(time_column.values, ('hour',))
+
+
+def _time_column(ctx):
+    import dataset_cache
+    import pandas as pd
+    dataset_cache.ensure_cache(ctx.csv_path, ctx.cache_dir)
+    return pd.Series(dataset_cache.load_columns(ctx.csv_path, ctx.cache_dir)['Time'])
+
+
+def legacy_split(ctx):
+    import pandas as pd
+    df = ctx.legacy_frame()
+
+    def run():
+        legit = df[df.Class == 0]
+        fraud = df[df.Class == 1]
+        return pd.concat([fraud[:300], legit.sample(300)]) # DataFrame.append in the original, gone from pandas 2
+    return run
+
+
+def split_indices(ctx):
+    import training
+    dataset = ctx.dataset()
+    return lambda: training.sample_indices(dataset.y, 0, classes=(dataset.legit, dataset.fraud))
+
+
+def fit_svc(ctx):
+    import training
+    dataset = ctx.dataset()
+    x, y = dataset.x, dataset.y
+    rows = training.sample_indices(y, 0, classes=(dataset.legit, dataset.fraud))
+    return lambda: training.fit('svc', x, y, rows, 0)
+
+
+def _served_model(ctx, x, y):
+    import training
+    return training.fit('svc', x, y, training.sample_indices(y, 0), 0)
+
+
+def legacy_predict(ctx):
+    from sklearn.metrics import confusion_matrix
+    df = ctx.legacy_frame()
+    x, y = ctx.features(df)
+    model = _served_model(ctx, x, y)
+
+    def run():
+        # the original passed the frame itself; .values is the same float64 conversion without the feature-name warning
+        return confusion_matrix(df['Class'], model.predict(df.drop(['Class'], axis=1).values))
+    return run
+
+
+def predict_scorer(ctx):
+    import numpy as np
+    import scoring
+    dataset = ctx.dataset()
+    x, y = dataset.x, dataset.y
+    scorer = scoring.make_scorer(_served_model(ctx, x, y))
+
+    def run():
+        predicted = scorer.score(x)[0]
+        return np.bincount(y.astype(np.intp) * 2 + predicted.astype(np.intp), minlength=4).reshape(2, 2)
+    return run
+
+
+def legacy_corr(ctx):
+    df = ctx.legacy_frame()
+    return lambda: df.corr(method='pearson')
+
+
+def corr_mode(mode):
+    def setup(ctx):
+        import correlation
+        import dataset_cache
+        dataset = ctx.dataset()
+        return lambda: correlation.summarize(dataset.x, dataset.columns, dataset.y, dataset_cache.FRAME_COLUMNS, mode)
+    return setup
+
+
+def _warm_dashboard(ctx):
+    # build the cache, the model and the stats once in a child, so the timed stages measure a normal (warm) start
+    subprocess.check_call([sys.executable, '-c', 'import fraud_detection_svc; fraud_detection_svc.create_app(warm=True)'],
+                          cwd=ROOT, env=ctx.dashboard_env())
+    os.environ.update(ctx.dashboard_env())
+
+
+def render_startup(ctx):
+    import importlib
+    _warm_dashboard(ctx)
+    return lambda: importlib.import_module('fraud_detection_svc').create_app(warm=True) # ready to serve
+
+
+def render_tab(tab):
+    def setup(ctx):
+        _warm_dashboard(ctx)
+        import fraud_detection_svc
+        app = fraud_detection_svc.create_app(warm=True)
+        return lambda: fraud_detection_svc.render_content(app.resources, tab)
+    return setup
+
+
+STAGES = [ # (name, setup); run in this order
+    ('legacy.load_csv', legacy_load),
+    ('load.cache_build', load_cache_build),
+    ('load.cache_open', load_cache_open),
+    ('legacy.hour_apply', legacy_hour),
+    ('hour.vectorised', hour_vectorised),
+    ('legacy.split_sample', legacy_split),
+    ('split.sample_indices', split_indices),
+    ('fit.svc_600', fit_svc),
+    ('legacy.predict_confusion', legacy_predict),
+    ('predict.scorer_confusion', predict_scorer),
+    ('legacy.corr', legacy_corr),
+    ('corr.exact', corr_mode('exact')),
+    ('corr.parallel', corr_mode('parallel')),
+    ('corr.sample', corr_mode('sample')),
+    ('render.startup', render_startup),
+    ('render.tab-1', render_tab('tab-1')),
+    ('render.tab-2', render_tab('tab-2')),
+    ('render.tab-3', render_tab('tab-3')),
+]
+
+
+def run_one(stage, csv_path, rows, work_dir, repeat):
+    # runs inside the child process: setup, reset the memory high-water mark, time the stage
+    setup = dict(STAGES)[stage]
+    fn = setup(Context(csv_path, rows, work_dir))
+    exact_peak = reset_peak_rss()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    best = min(times)
+    return {
+        'stage': stage,
+        'rows': rows,
+        'seconds': best,
+        'seconds_all': times,
+        'rows_per_sec': rows / best if best > 0 else None,
+        'peak_rss_mb': peak_rss_mb(),
+        'peak_rss_is_stage_only': exact_peak, # False: the peak includes the setup
+    }
+
+
+def run_all(args):
+    sizes = [int(s) for s in args.sizes.split(',')]
+    wanted = args.stages.split(',') if args.stages else None
+    stages = [name for name, _ in STAGES if not wanted or any(name == w or name.split('.')[0] == w for w in wanted)]
+    import synthetic
+    os.makedirs(args.data_dir, exist_ok=True)
+    results = []
+    for rows in sizes:
+        csv_path = synthetic.write_csv(os.path.join(args.data_dir, 'creditcard_%d.csv' % rows), rows)
+        for stage in stages:
+            if stage.startswith('legacy.') and rows > args.legacy_max_rows:
+                print('%-26s %9d rows  skipped (--legacy-max-rows)' % (stage, rows), file=sys.stderr)
+                continue
+            work_dir = tempfile.mkdtemp(prefix='bench-', dir=args.data_dir)
+            try:
+                out = subprocess.run([sys.executable, os.path.abspath(__file__), '--one', stage, '--rows', str(rows),
+                                      '--csv', csv_path, '--work-dir', work_dir, '--repeat', str(args.repeat)],
+                                     cwd=ROOT, stdout=subprocess.PIPE, timeout=args.timeout)
+                result = json.loads(out.stdout.decode().strip().splitlines()[-1]) if out.returncode == 0 else \
+                    {'stage': stage, 'rows': rows, 'error': 'exit code %d' % out.returncode}
+            except subprocess.TimeoutExpired:
+                result = {'stage': stage, 'rows': rows, 'error': 'timeout after %ds' % args.timeout}
+            finally:
+                shutil.rmtree(work_dir, ignore_errors=True)
+            results.append(result)
+            if 'error' in result:
+                print('%-26s %9d rows  %s' % (stage, rows, result['error']), file=sys.stderr)
+            else:
+                print('%-26s %9d rows %10.4fs %14.0f rows/s %9.1f MB peak' % (
+                    stage, rows, result['seconds'], result['rows_per_sec'] or 0, result['peak_rss_mb']), file=sys.stderr)
+    report = {
+        'created': datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'results': results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print('wrote %s' % args.out, file=sys.stderr)
+
+
+def compare(old_path, new_path):
+    # per stage and size: old seconds, new seconds, speed-up, peak RSS change
+    with open(old_path) as f:
+        old = dict(((r['stage'], r['rows']), r) for r in json.load(f)['results'] if 'error' not in r)
+    with open(new_path) as f:
+        new = [r for r in json.load(f)['results'] if 'error' not in r]
+    print('%-26s %9s %10s %10s %8s %10s' % ('stage', 'rows', 'old s', 'new s', 'speedup', 'rss MB'))
+    for r in new:
+        before = old.get((r['stage'], r['rows']))
+        if before:
+            print('%-26s %9d %10.4f %10.4f %7.2fx %+10.1f' % (r['stage'], r['rows'], before['seconds'], r['seconds'],
+                                                             before['seconds'] / max(r['seconds'], 1e-12),
+                                                             r['peak_rss_mb'] - before['peak_rss_mb']))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark loading, preprocessing, training, scoring and rendering.')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help='dataset sizes in rows')
+    parser.add_argument('--stages', default=None, help='comma separated stage names or groups (load, hour, legacy, render, ...)')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per stage; the best is reported')
+    parser.add_argument('--legacy-max-rows', type=int, default=1000000, help='skip legacy stages above this size')
+    parser.add_argument('--timeout', type=int, default=3600, help='seconds per stage')
+    parser.add_argument('--data-dir', default=os.path.join(HERE, 'data'), help='where synthetic csv files are kept')
+    parser.add_argument('--out', default=os.path.join(HERE, 'results', time.strftime('%Y%m%d-%H%M%S.json')))
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='compare two result files instead of running')
+    parser.add_argument('--one', help=argparse.SUPPRESS) # internal: run one stage in this process
+    parser.add_argument('--rows', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--csv', help=argparse.SUPPRESS)
+    parser.add_argument('--work-dir', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+    elif args.one:
+        print(json.dumps(run_one(args.one, args.csv, args.rows, args.work_dir, args.repeat)))
+    else:
+        run_all(args)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,63 @@
+### synthetic stand-in for creditcard.csv
+# same columns and roughly the same shape as the kaggle file (Time over two days, V1..V28 with falling
+# variance like PCA components, a skewed Amount, ~0.17% fraud that is shifted on a few components),
+# so every benchmark runs offline at any size. generated in chunks, so 5M rows need no more memory than 10k.
+# usage: python benchmarks/synthetic.py 285000 creditcard_285k.csv [--seed 0]
+
+# argparse, os, sys (standard library)
+import argparse
+import os
+import sys
+
+# numpy and pandas (needed to be installed via pip or the like)
+import numpy as np
+import pandas as pd
+
+COLUMNS = ['Time'] + ['V%d' % i for i in range(1, 29)] + ['Amount', 'Class']
+FRAUD_RATE = 492.0 / 284807 # as in the kaggle data
+TWO_DAYS = 172792
+
+
+def generate_chunk(rng, rows, start_row, total_rows):
+    # 'rows' transactions starting at row 'start_row' of 'total_rows' (Time grows with the row number)
+    time = np.floor((np.arange(start_row, start_row + rows) + rng.uniform(size=rows)) * TWO_DAYS / max(total_rows, 1))
+    scale = np.linspace(2.0, 0.3, 28) # V1 varies most, V28 least
+    v = rng.normal(size=(rows, 28)) * scale
+    label = (rng.uniform(size=rows) < FRAUD_RATE).astype(np.int64)
+    v[label == 1, :14] += rng.normal(-2.0, 1.0, size=(int(label.sum()), 14)) * scale[:14] # fraud sits elsewhere on the first components
+    amount = np.round(np.exp(rng.normal(3.0, 1.5, size=rows)), 2)
+    frame = pd.DataFrame(v, columns=COLUMNS[1:29])
+    frame.insert(0, 'Time', time)
+    frame['Amount'] = amount
+    frame['Class'] = label
+    return frame
+
+
+def write_csv(path, rows, seed=0, chunk_rows=200000):
+    # write 'rows' synthetic transactions to 'path' (skipped if a file with that many rows is already there)
+    marker = path + '.rows'
+    if os.path.exists(path) and os.path.exists(marker) and open(marker).read().strip() == '%d %d' % (rows, seed):
+        return path
+    rng = np.random.RandomState(seed)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', newline='') as f:
+        for start in range(0, rows, chunk_rows):
+            generate_chunk(rng, min(chunk_rows, rows - start), start, rows).to_csv(f, header=start == 0, index=False)
+    os.replace(tmp, path)
+    with open(marker, 'w') as f:
+        f.write('%d %d' % (rows, seed))
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Write a synthetic creditcard.csv.')
+    parser.add_argument('rows', type=int)
+    parser.add_argument('path')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    write_csv(args.path, args.rows, args.seed)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,134 @@
+### correlation table (plus class counts and column ranges) for large data sets
+# modes, picked with FRAUD_CORR_MODE:
+# 'exact'     one pass over every row through StreamingStats (float64)
+# 'parallel'  the rows split into blocks, one StreamingStats per block on a thread pool (numpy releases the GIL
+#             in the matrix products), merged with the pairwise update; the same table as 'exact' up to rounding
+# 'sample'    correlation of a uniform random sample of FRAUD_CORR_SAMPLE_ROWS rows. the standard error of a
+#             coefficient is at most about 1/sqrt(rows) (250k rows -> 0.002), and the matrix products no longer
+#             grow with the data; the only full pass left is a min/max scan
+# 'auto'      (default) 'parallel' up to FRAUD_CORR_AUTO_ROWS rows, 'sample' above
+# class counts and min/max (the Predict tab's slider ranges) are exact in every mode.
+
+# os, concurrent.futures (standard library)
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# numpy (needed to be installed via pip or the like)
+import numpy as np
+
+from streaming_stats import StreamingStats
+
+MODES = ('auto', 'exact', 'parallel', 'sample')
+DEFAULT_MODE = os.environ.get('FRAUD_CORR_MODE', 'auto')
+SAMPLE_ROWS = int(os.environ.get('FRAUD_CORR_SAMPLE_ROWS') or 250000) # reservoir size: the error/speed trade-off
+AUTO_SAMPLE_ABOVE = int(os.environ.get('FRAUD_CORR_AUTO_ROWS') or 5000000) # 'auto' samples above this many rows
+THREADS = int(os.environ.get('FRAUD_CORR_THREADS') or os.cpu_count() or 1)
+
+
+def sample_rows(n, size, seed=0):
+    # sorted row numbers of a uniform sample without replacement of 'size' out of 'n' rows. the same
+    # distribution a reservoir would give, but since n is known up front no pass over the rows is needed
+    if size >= n:
+        return np.arange(n)
+    return np.sort(np.random.default_rng(seed).choice(n, size=size, replace=False))
+
+
+def column_ranges(x, threads=THREADS, wide=64):
+    # exact per-column min and max of a row-major matrix. reducing over 'wide' rows at once keeps the inner loop
+    # long (a plain x.min(axis=0) over 30 columns is ~4x slower); blocks of rows run on a thread pool
+    def run(block):
+        k = len(block) // wide * wide
+        lo, hi = np.full(block.shape[1], np.inf), np.full(block.shape[1], -np.inf)
+        if k:
+            flat = block[:k].reshape(k // wide, wide * block.shape[1])
+            lo = np.minimum(lo, flat.min(axis=0).reshape(wide, -1).min(axis=0))
+            hi = np.maximum(hi, flat.max(axis=0).reshape(wide, -1).max(axis=0))
+        if k < len(block):
+            lo, hi = np.minimum(lo, block[k:].min(axis=0)), np.maximum(hi, block[k:].max(axis=0))
+        return lo, hi
+    bounds = np.linspace(0, len(x), max(threads, 1) + 1).astype(np.int64)
+    blocks = [x[bounds[i]:bounds[i + 1]] for i in range(len(bounds) - 1)]
+    if len(blocks) == 1:
+        parts = [run(blocks[0])]
+    else:
+        with ThreadPoolExecutor(len(blocks)) as pool:
+            parts = list(pool.map(run, blocks))
+    return np.min([lo for lo, _ in parts], axis=0), np.max([hi for _, hi in parts], axis=0)
+
+
+def resolve_mode(mode, rows):
+    # the mode actually used for 'rows' rows ('auto' becomes 'parallel' or 'sample')
+    if mode not in MODES:
+        raise ValueError('unknown correlation mode %r (known: %s)' % (mode, ', '.join(MODES)))
+    if mode == 'auto':
+        return 'sample' if rows > AUTO_SAMPLE_ABOVE else 'parallel'
+    return mode
+
+
+def block_stats(x, columns, labels, stats_columns, threads=THREADS):
+    # StreamingStats over every row, one block of rows per thread, merged in row order
+    blocks = np.linspace(0, len(x), max(threads, 1) + 1).astype(np.int64)
+    def run(i):
+        return StreamingStats(stats_columns).update_matrix(x[blocks[i]:blocks[i + 1]], columns, labels[blocks[i]:blocks[i + 1]])
+    if threads <= 1:
+        return run(0)
+    with ThreadPoolExecutor(threads) as pool:
+        parts = list(pool.map(run, range(threads)))
+    merged = StreamingStats(stats_columns)
+    for part in parts:
+        merged.merge(part)
+    return merged
+
+
+def sampled_summary(x, columns, labels, stats_columns, size=SAMPLE_ROWS, threads=THREADS, seed=0):
+    # exact counts and min/max, and the correlation table of a random sample of 'size' rows
+    rows = sample_rows(len(x), size, seed)
+    corr = StreamingStats(stats_columns).update_matrix(x[rows], columns, labels[rows]).correlation()
+    mins, maxs = column_ranges(x, threads)
+    counts = np.bincount(np.asarray(labels, dtype=np.intp))
+    values = np.flatnonzero(counts)
+    by_column = dict(zip(columns, zip(mins.tolist(), maxs.tolist())))
+    by_column['Class'] = (float(values.min()), float(values.max())) if len(values) else (np.inf, -np.inf)
+    return {
+        'columns': list(stats_columns),
+        'rows': len(x),
+        'class_counts': dict((value, int(counts[value])) for value in values.tolist()),
+        'min': [by_column[col][0] for col in stats_columns],
+        'max': [by_column[col][1] for col in stats_columns],
+        'corr': corr,
+        'info': {'mode': 'sample', 'rows_used': len(rows), 'rows': len(x), 'std_error': float(1.0 / np.sqrt(max(len(rows), 1)))},
+    }
+
+
+def summarize(x, columns, labels, stats_columns, mode=None, sample_rows=None, threads=None, seed=0):
+    # counts, ranges and the correlation table of a matrix 'x' whose columns are named 'columns' (e.g. a
+    # dataset_cache.Dataset), for 'stats_columns' (a 'Class' entry is read from 'labels'); see the top of this file
+    mode = resolve_mode(mode or DEFAULT_MODE, len(x))
+    threads = threads or THREADS
+    if mode == 'sample':
+        return sampled_summary(x, columns, labels, stats_columns, sample_rows or SAMPLE_ROWS, threads, seed)
+    stats = block_stats(x, columns, labels, stats_columns, threads if mode == 'parallel' else 1)
+    return summary_of(stats, {'mode': mode, 'rows_used': stats.n, 'rows': stats.n,
+                              'threads': threads if mode == 'parallel' else 1})
+
+
+def summary_of(stats, info=None):
+    # the same summary from a StreamingStats (e.g. one accumulated by streaming_stats.py): exact over its rows
+    return {
+        'columns': list(stats.columns),
+        'rows': stats.n,
+        'class_counts': dict(stats.class_counts),
+        'min': stats.min.tolist(),
+        'max': stats.max.tolist(),
+        'corr': stats.correlation(),
+        'info': info or {'mode': 'exact', 'rows_used': stats.n, 'rows': stats.n},
+    }
+
+
+def describe(info):
+    # how the table was made, for the heatmap title
+    if info['mode'] == 'sample':
+        return 'random sample of {:,} of {:,} rows, standard error <= {:.3f}'.format(info['rows_used'], info['rows'], info['std_error'])
+    if info['mode'] == 'parallel':
+        return 'exact, {:,} rows in {} parallel blocks'.format(info['rows'], info['threads'])
+    return 'exact, {:,} rows'.format(info['rows'])
@@ -0,0 +1,188 @@
+### columnar, memory-mapped cache of creditcard.csv
+# the csv is parsed once and written as typed .npy columns; every process after that opens
+# the columns with np.load(mmap_mode='r'), so startup is a few page-table entries and all
+# workers on a box share one copy of the data through the OS page cache.
+# the model's features are one contiguous float32 matrix (V1..V28, Amount, hour) next to a uint8
+# label array and the row numbers of each class; training, statistics and scoring all read these
+# (see Dataset), so there is exactly one copy of the data however many parts of the app use it.
+
+# hashlib, json, os, shutil, tempfile (standard library)
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+# numpy (needed to be installed via pip or the like)
+import numpy as np
+
+# pandas (needed to be installed via pip or the like)
+import pandas as pd
+
+# vectorised time features (see features.py)
+import features
+
+CACHE_FORMAT = 2 # bump this whenever the on-disk layout changes, so old caches get rebuilt
+
+FEATURE_COLUMNS = ['V%d' % i for i in range(1, 29)] + ['Amount'] # float32 columns, in the order of the csv
+CSV_DTYPES = dict([(col, np.float32) for col in FEATURE_COLUMNS] + [('Time', np.float64), ('Class', np.uint8)])
+
+CACHED_FEATURES = ('hour',) # derived features written into the cache next to the raw columns (bump CACHE_FORMAT when changing this)
+
+MATRIX_COLUMNS = FEATURE_COLUMNS + list(CACHED_FEATURES) # columns of the float32 feature matrix, in order; what models are trained on
+FRAME_COLUMNS = FEATURE_COLUMNS + ['Class'] + list(CACHED_FEATURES) # every column of the data set (e.g. for statistics)
+
+DEFAULT_CSV = os.environ.get('CREDITCARD_CSV', 'creditcard.csv') # where the kaggle csv lives
+DEFAULT_CACHE_DIR = os.environ.get('FRAUD_CACHE_DIR', '.creditcard_cache') # where the converted columns live
+
+
+def file_digest(path, chunk_size=1 << 20):
+    # sha1 of the whole file, read in 1MB chunks so memory stays flat
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _source_stat(path):
+    st = os.stat(path)
+    return {'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+
+def _read_pointer(cache_dir):
+    # 'current.json' tells us which build directory belongs to which version of the csv
+    try:
+        with open(os.path.join(cache_dir, 'current.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json_atomic(path, payload):
+    # write to a temp file and rename it over the old one, so readers never see half a file
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(payload, f)
+    os.replace(tmp, path)
+
+
+def _build(csv_path, build_dir):
+    # one-time conversion: parse with the fast C engine straight into the final dtypes
+    frame = pd.read_csv(csv_path, dtype=CSV_DTYPES)
+    tmp_dir = tempfile.mkdtemp(dir=os.path.dirname(build_dir), prefix='build-')
+    try:
+        x = np.lib.format.open_memmap(os.path.join(tmp_dir, 'x.npy'), mode='w+', dtype=np.float32,
+                                      shape=(len(frame), len(MATRIX_COLUMNS))) # (rows, 30) row-major, filled in place on disk
+        for i, col in enumerate(FEATURE_COLUMNS):
+            x[:, i] = frame[col].values
+        derived = features.derive(frame['Time'].values, CACHED_FEATURES) # 'hour' and friends, straight from the seconds
+        for i, name in enumerate(CACHED_FEATURES, len(FEATURE_COLUMNS)):
+            x[:, i] = derived[name]
+        x.flush()
+        del x
+        labels = frame['Class'].values.astype(np.uint8)
+        np.save(os.path.join(tmp_dir, 'Class.npy'), labels)
+        np.save(os.path.join(tmp_dir, 'legit.npy'), np.flatnonzero(labels == 0)) # row numbers of each class
+        np.save(os.path.join(tmp_dir, 'fraud.npy'), np.flatnonzero(labels == 1))
+        np.save(os.path.join(tmp_dir, 'Time.npy'), frame['Time'].values.astype(np.float64))
+        os.replace(tmp_dir, build_dir) # another worker may have won the race; its build is identical
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if not os.path.isdir(build_dir):
+            raise
+    return len(frame)
+
+
+def ensure_cache(csv_path=DEFAULT_CSV, cache_dir=DEFAULT_CACHE_DIR):
+    # returns the build directory matching the current csv, (re)building it when the csv changed.
+    # fast path is a single stat(): size and mtime match what we recorded -> nothing to do.
+    os.makedirs(cache_dir, exist_ok=True)
+    stat = _source_stat(csv_path)
+    pointer = _read_pointer(cache_dir)
+    if pointer and pointer.get('format') == CACHE_FORMAT and pointer.get('source') == stat:
+        build_dir = os.path.join(cache_dir, pointer['build'])
+        if os.path.isdir(build_dir):
+            return build_dir
+
+    # mtime or size moved: hash the csv to find out whether the content really changed (e.g. a 'touch' or a copy)
+    digest = file_digest(csv_path)
+    build = 'v%d-%s' % (CACHE_FORMAT, digest[:16])
+    build_dir = os.path.join(cache_dir, build)
+    rows = pointer.get('rows') if pointer and pointer.get('build') == build else None
+    if not os.path.isdir(build_dir):
+        rows = _build(csv_path, build_dir)
+    if rows is None:
+        rows = len(np.load(os.path.join(build_dir, 'Class.npy'), mmap_mode='r'))
+    _write_json_atomic(os.path.join(cache_dir, 'current.json'), {
+        'format': CACHE_FORMAT,
+        'source': stat,
+        'sha1': digest,
+        'build': build,
+        'rows': rows,
+    })
+
+    # drop builds of older versions of the csv; a worker still mapping them keeps its pages until it exits
+    for name in os.listdir(cache_dir):
+        if name.startswith('v') and name != build:
+            shutil.rmtree(os.path.join(cache_dir, name), ignore_errors=True)
+    return build_dir
+
+
+def dataset_version(csv_path=DEFAULT_CSV, cache_dir=DEFAULT_CACHE_DIR):
+    # short identifier of the cached data, handy for keying anything derived from it
+    return os.path.basename(ensure_cache(csv_path, cache_dir))
+
+
+def load_columns(csv_path=DEFAULT_CSV, cache_dir=DEFAULT_CACHE_DIR):
+    # read-only memory maps of every cached array, nothing is copied into the process
+    build_dir = ensure_cache(csv_path, cache_dir)
+    return dict((name, np.load(os.path.join(build_dir, name + '.npy'), mmap_mode='r'))
+                for name in ('x', 'Class', 'legit', 'fraud', 'Time'))
+
+
+class Dataset(object):
+    # the data set as the app uses it:
+    #   x      (rows, len(columns)) float32 feature matrix, one contiguous block
+    #   y      uint8 labels (0 legit, 1 fraud)
+    #   legit  row numbers of the legit transactions, fraud likewise: x[dataset.fraud] picks the fraud rows
+    #          when they are needed, instead of keeping filtered copies around
+    # all of them are read-only memory maps of the cache
+    columns = MATRIX_COLUMNS
+
+    def __init__(self, x, y, legit, fraud, time, version):
+        self.x = x
+        self.y = y
+        self.legit = legit
+        self.fraud = fraud
+        self.time = time # raw seconds of 'Time', for features that are not cached
+        self.version = version # see dataset_version()
+
+    def __len__(self):
+        return len(self.y)
+
+    def column(self, name):
+        # one feature column as a (strided) view of the matrix
+        return self.x[:, self.columns.index(name)]
+
+    def frame(self):
+        # the data as a data frame (V1..V28, Amount, hour, Class) for ad-hoc analysis, wrapping the matrix without a copy
+        frame = pd.DataFrame(self.x, columns=self.columns, copy=False)
+        frame['Class'] = self.y
+        return frame
+
+
+def load_dataset(csv_path=DEFAULT_CSV, cache_dir=DEFAULT_CACHE_DIR):
+    arrays = load_columns(csv_path, cache_dir)
+    return Dataset(arrays['x'], arrays['Class'], arrays['legit'], arrays['fraud'], arrays['Time'],
+                   dataset_version(csv_path, cache_dir))
+
+
+def load_derived(names, csv_path=DEFAULT_CSV, cache_dir=DEFAULT_CACHE_DIR):
+    # derived features that are not cached are computed from the mapped 'Time' column on demand
+    return features.derive(load_columns(csv_path, cache_dir)['Time'], names)
+
+
+def load_frame(csv_path=DEFAULT_CSV, cache_dir=DEFAULT_CACHE_DIR):
+    # the preprocessed data as a data frame (see Dataset.frame)
+    return load_dataset(csv_path, cache_dir).frame()
@@ -0,0 +1,68 @@
+### derived features computed from the integer 'Time' column
+# every feature is plain array arithmetic over the whole column, so adding one never brings back
+# a per-row python loop. register new ones with the @feature decorator below.
+
+# numpy (needed to be installed via pip or the like)
+import numpy as np
+
+FEATURES = {} # name -> (function, dtype), filled by @feature
+
+SECONDS_PER_HOUR = 3600
+SECONDS_PER_DAY = 86400
+
+
+def feature(name, dtype):
+    # decorator that registers fn(seconds) -> array under 'name', stored as 'dtype'
+    def register(fn):
+        FEATURES[name] = (fn, np.dtype(dtype))
+        return fn
+    return register
+
+
+@feature('hour', np.uint8)
+def hour(seconds):
+    # 'hour' part of the timestamp: 1970-01-01 23:59:59 -> 23 (same as datetime.utcfromtimestamp(seconds).hour)
+    return np.floor_divide(seconds, SECONDS_PER_HOUR) % 24
+
+
+@feature('minute_of_day', np.uint16)
+def minute_of_day(seconds):
+    # minutes since midnight: 1970-01-01 23:59:59 -> 1439
+    return np.floor_divide(seconds, 60) % (24 * 60)
+
+
+@feature('day', np.uint16)
+def day(seconds):
+    # whole days since the first second of the capture
+    return np.floor_divide(seconds, SECONDS_PER_DAY)
+
+
+@feature('day_of_week', np.uint8)
+def day_of_week(seconds):
+    # monday = 0 ... sunday = 6, like pandas' .dt.dayofweek; 1970-01-01 was a thursday (3)
+    return (np.floor_divide(seconds, SECONDS_PER_DAY) + 3) % 7
+
+
+@feature('seconds_since_previous', np.float32)
+def seconds_since_previous(seconds):
+    # gap to the previous transaction in time order (0 for the first one)
+    seconds = np.asarray(seconds)
+    gaps = np.diff(seconds, prepend=seconds[:1])
+    if len(seconds) and gaps.min() < 0: # not sorted by time: compute the gaps in time order and put them back in place
+        order = np.argsort(seconds, kind='stable')
+        gaps = np.empty_like(gaps)
+        gaps[order] = np.diff(seconds[order], prepend=seconds[order[:1]])
+    return gaps
+
+
+def derive(seconds, names=('hour',)):
+    # compute the named features from an array of seconds; returns {name: array}
+    unknown = [name for name in names if name not in FEATURES]
+    if unknown:
+        raise ValueError('unknown derived feature(s): %s (known: %s)' % (', '.join(unknown), ', '.join(sorted(FEATURES))))
+    seconds = np.asarray(seconds)
+    out = {}
+    for name in names:
+        fn, dtype = FEATURES[name]
+        out[name] = fn(seconds).astype(dtype, copy=False)
+    return out
@@ -0,0 +1,36 @@
+### gunicorn settings for the production server: gunicorn -c gunicorn.conf.py
+# the app (wsgi.py) is imported once in the master, which loads the data, the model and the statistics before
+# forking the workers; they share all of it copy-on-write. when models/LATEST changes, the master loads the new
+# version and replaces the workers one by one (see wsgi.watch_models), so every worker serves the same model.
+# FRAUD_BIND (default 127.0.0.1:8050), WEB_CONCURRENCY (workers, default one per core), FRAUD_THREADS (per worker)
+
+# gc, os (standard library)
+import gc
+import os
+
+wsgi_app = 'wsgi:server'
+bind = os.environ.get('FRAUD_BIND', '127.0.0.1:8050') # no authentication anywhere: other interfaces only on purpose
+workers = int(os.environ.get('WEB_CONCURRENCY') or os.cpu_count() or 1)
+threads = int(os.environ.get('FRAUD_THREADS') or 1)
+preload_app = True # load everything in the master, before the fork
+timeout = 120 # a large POST /api/score can take a while
+graceful_timeout = 30 # how long a replaced worker may finish its requests
+
+# a collection in a worker would write to every object it inherited (the gc header sits in the object), turning
+# shared pages into private copies. so the master doesn't collect (no freed holes scattered through its pages),
+# everything it holds is frozen out of the collector right before each fork, and the worker collects normally
+gc.disable()
+
+
+def when_ready(server):
+    # master, app loaded, listening, no worker yet
+    import wsgi
+    wsgi.start_model_watcher(server, wsgi.app)
+
+
+def pre_fork(server, worker):
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    gc.enable()
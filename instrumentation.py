@@ -0,0 +1,246 @@
+### timing instrumentation, a prometheus /metrics route and a slow-request profiler
+# FRAUD_METRICS=1             time data loading, model loading/training, statistics and scoring (timed(stage)),
+#                             and every request to the server: latency histogram, count and request/response size
+#                             per route, where a dash callback is its own route ('callback:<output>', for
+#                             outputs the app registered; 'callback:unknown' for anything else).
+#                             everything is served in prometheus text format on GET /metrics.
+# FRAUD_PROFILE_SLOW_MS=500   sample the stack of every request thread and, for a request slower than this,
+#                             write the samples as folded stacks (flamegraph.pl / speedscope input) to
+#                             FRAUD_PROFILE_DIR (default 'profiles'), one file per slow request.
+# both are off by default; instrument(server) then adds nothing and timed() is a shared no-op context.
+
+# collections, contextlib, os, sys, threading, time (standard library)
+import collections
+import contextlib
+import os
+import sys
+import threading
+import time
+
+ENABLED = os.environ.get('FRAUD_METRICS', '').lower() not in ('', '0', 'false', 'no')
+PROFILE_SLOW_MS = float(os.environ.get('FRAUD_PROFILE_SLOW_MS') or 0) # 0 = profiler off
+PROFILE_DIR = os.environ.get('FRAUD_PROFILE_DIR', 'profiles')
+PROFILE_INTERVAL_MS = float(os.environ.get('FRAUD_PROFILE_INTERVAL_MS') or 5) # time between two stack samples
+PROFILE_LIMIT = int(os.environ.get('FRAUD_PROFILE_LIMIT') or 20) # stop writing profiles after this many
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0) # seconds
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216) # bytes
+
+
+### metrics
+def _label_text(names, values):
+    if not names:
+        return ''
+    return '{%s}' % ','.join('%s="%s"' % (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+                             for name, value in zip(names, values))
+
+
+class Counter(object):
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = collections.defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, *labels):
+        with self._lock:
+            self._values[labels] += amount
+
+    def render(self):
+        lines = ['# HELP %s %s' % (self.name, self.help), '# TYPE %s counter' % self.name]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append('%s%s %r' % (self.name, _label_text(self.labelnames, labels), value))
+        return lines
+
+
+class Histogram(object):
+    # cumulative buckets, sum and count per label combination, as prometheus expects them
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {} # labels -> [count per bucket (+Inf last), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            i = 0
+            while i < len(self.buckets) and value > self.buckets[i]:
+                i += 1
+            series[0][i] += 1
+            series[1] += value
+
+    def render(self):
+        lines = ['# HELP %s %s' % (self.name, self.help), '# TYPE %s histogram' % self.name]
+        names = self.labelnames + ('le',)
+        with self._lock:
+            for labels, (counts, total) in sorted(self._series.items()):
+                running = 0
+                for bound, count in zip(self.buckets + ('+Inf',), counts):
+                    running += count
+                    lines.append('%s_bucket%s %d' % (self.name, _label_text(names, labels + (bound,)), running))
+                lines.append('%s_sum%s %r' % (self.name, _label_text(self.labelnames, labels), total))
+                lines.append('%s_count%s %d' % (self.name, _label_text(self.labelnames, labels), running))
+        return lines
+
+
+STAGE_SECONDS = Histogram('fraud_stage_seconds', 'Time spent in data loading, model loading/training, statistics and scoring.', ('stage',))
+SCORED_ROWS = Counter('fraud_scored_rows_total', 'Transactions scored, by caller.', ('stage',))
+REQUEST_SECONDS = Histogram('fraud_request_seconds', 'Request latency by route (dash callbacks by output).', ('route',))
+REQUESTS = Counter('fraud_requests_total', 'Requests by route and status code.', ('route', 'status'))
+REQUEST_BYTES = Histogram('fraud_request_bytes', 'Request body size by route.', ('route',), SIZE_BUCKETS)
+RESPONSE_BYTES = Histogram('fraud_response_bytes', 'Response body size by route (streamed responses are not counted).', ('route',), SIZE_BUCKETS)
+METRICS = [STAGE_SECONDS, SCORED_ROWS, REQUEST_SECONDS, REQUESTS, REQUEST_BYTES, RESPONSE_BYTES]
+
+
+def render_metrics():
+    # everything in prometheus text exposition format
+    return '\n'.join(line for metric in METRICS for line in metric.render()) + '\n'
+
+
+class _Timer(object):
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        STAGE_SECONDS.observe(time.perf_counter() - self.start, self.stage)
+        return False
+
+
+_OFF = contextlib.nullcontext()
+
+
+def timed(stage):
+    # with timed('model_load'): ... -> observed in fraud_stage_seconds{stage="model_load"} when metrics are on
+    return _Timer(stage) if ENABLED else _OFF
+
+
+def count_scored(stage, rows):
+    if ENABLED:
+        SCORED_ROWS.inc(rows, stage)
+
+
+### sampling profiler
+def _folded(frame):
+    # 'outer;...;inner' for the stack ending in 'frame', one entry per function
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append('%s (%s)' % (code.co_name, os.path.basename(code.co_filename)))
+        frame = frame.f_back
+    return ';'.join(reversed(parts))
+
+
+class SlowRequestProfiler(object):
+    # one background thread samples the stacks of the threads currently serving a request;
+    # a request's samples are written out only if the request turns out slower than 'slow_ms'
+    def __init__(self, slow_ms, directory, interval_ms=5, limit=20):
+        self.slow_ms = slow_ms
+        self.directory = directory
+        self.interval = interval_ms / 1000.0
+        self.limit = limit
+        self.written = 0
+        self._active = {} # thread ident -> Counter of folded stacks
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _sample(self):
+        while True:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, stacks in self._active.items():
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        stacks[_folded(frame)] += 1
+
+    def begin(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._sample, name='slow-request-profiler', daemon=True)
+                    self._thread.start()
+        with self._lock:
+            self._active[threading.get_ident()] = collections.Counter()
+
+    def end(self, seconds, route):
+        # stop sampling this thread; returns the profile's path if one was written
+        with self._lock:
+            stacks = self._active.pop(threading.get_ident(), None)
+        if not stacks or seconds * 1000.0 < self.slow_ms or self.written >= self.limit:
+            return None
+        self.written += 1
+        name = ''.join(c if c.isalnum() or c in '-_.' else '_' for c in route)[:80]
+        path = os.path.join(self.directory, '%s-%s-%dms.folded' % (time.strftime('%Y%m%d-%H%M%S'), name, seconds * 1000))
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(path, 'w') as f:
+                for stack, count in stacks.most_common():
+                    f.write('%s %d\n' % (stack, count))
+        except OSError as e: # a profile that can't be written must not fail the request
+            print('could not write profile %s: %s' % (path, e), file=sys.stderr)
+            return None
+        return path
+
+
+### flask hooks
+def _route(flask, callbacks):
+    # bounded label for the current request: the dash callback it runs, or the url rule it matched.
+    # the callback's output comes from the request body, so only outputs registered in 'callbacks' (the app's
+    # callback map) become labels; anything else a client sends is 'callback:unknown'
+    request = flask.request
+    if request.path.endswith('/_dash-update-component'):
+        body = request.get_json(silent=True)
+        output = body.get('output') if isinstance(body, dict) else None
+        return 'callback:%s' % (output if isinstance(output, str) and output in callbacks else 'unknown')
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+
+def instrument(server, callbacks=()):
+    # add the hooks switched on by the environment (see the top of this file) to a flask app, e.g. dash's app.server;
+    # 'callbacks' is what dash callback outputs may be labelled by (e.g. app.callback_map, read at request time)
+    if not ENABLED and not PROFILE_SLOW_MS:
+        return server
+    import flask
+    profiler = SlowRequestProfiler(PROFILE_SLOW_MS, PROFILE_DIR, PROFILE_INTERVAL_MS, PROFILE_LIMIT) if PROFILE_SLOW_MS else None
+
+    @server.before_request
+    def _start_timer():
+        flask.g.instrumentation_start = time.perf_counter()
+        if profiler is not None:
+            profiler.begin()
+
+    @server.after_request
+    def _record(response):
+        seconds = time.perf_counter() - flask.g.instrumentation_start
+        route = _route(flask, callbacks)
+        if ENABLED:
+            REQUEST_SECONDS.observe(seconds, route)
+            REQUESTS.inc(1, route, response.status_code)
+            REQUEST_BYTES.observe(flask.request.content_length or 0, route)
+            if not response.is_streamed:
+                RESPONSE_BYTES.observe(response.calculate_content_length() or 0, route)
+        if profiler is not None:
+            profiler.end(seconds, route)
+        return response
+
+    @server.teardown_request
+    def _stop_profiler(exc):
+        if profiler is not None and exc is not None: # after_request was skipped, just stop sampling
+            profiler.end(0, '')
+
+    if ENABLED:
+        @server.route('/metrics')
+        def metrics():
+            return flask.Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+    return server
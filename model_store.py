@@ -0,0 +1,169 @@
+### versioned model artifacts
+# a trained model is written once (by train_model.py) into models/v0001, models/v0002, ... together
+# with everything needed to reproduce and audit it. 'models/LATEST' names the version to serve;
+# the dashboard loads it at startup and ModelWatcher swaps to a newer one without a restart.
+# a linear model's weights are also saved as plain arrays (weights.npz), so scoring with it needs
+# numpy only: the pickle (and with it sklearn) is loaded when .model is first used.
+
+# json, os, pickle, shutil, sys, tempfile, threading, time (standard library)
+import json
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+# numpy (needed to be installed via pip or the like)
+import numpy as np
+
+import instrumentation
+import scoring
+
+DEFAULT_MODEL_DIR = os.environ.get('FRAUD_MODEL_DIR', 'models') # where the artifacts live
+LATEST = 'LATEST' # file holding the name of the version to serve
+WEIGHTS = 'weights.npz' # coef, intercept and classes of a linear model
+
+
+class Artifact(object):
+    # a loaded model version: the fitted estimator plus its metadata
+    def __init__(self, version, model, meta, sample_indices, path=None):
+        self.version = version # e.g. 'v0003'
+        self._model = model # fitted sklearn estimator, or None to unpickle it from 'path' on first use
+        self.meta = meta # seed, feature columns, dataset version, metrics, ...
+        self.sample_indices = sample_indices # row numbers of the training sample within the dataset
+        self.path = path # the version's directory
+        self._scorer = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    with open(os.path.join(self.path, 'model.pkl'), 'rb') as f:
+                        self._model = pickle.load(f)
+        return self._model
+
+    @property
+    def scorer(self):
+        # fast label/score path for this model (see scoring.py), built on first use;
+        # straight from weights.npz when there is one, so the pickle isn't needed for scoring
+        if self._scorer is None:
+            weights = os.path.join(self.path, WEIGHTS) if self._model is None and self.path else None
+            if weights and os.path.exists(weights):
+                with np.load(weights) as saved:
+                    self._scorer = scoring.LinearScorer(saved['coef'], saved['intercept'], saved['classes'])
+            else:
+                self._scorer = scoring.make_scorer(self.model)
+        return self._scorer
+
+    @property
+    def feature_columns(self):
+        return self.meta['feature_columns']
+
+
+def _next_version(model_dir):
+    numbers = [int(name[1:]) for name in os.listdir(model_dir) if name.startswith('v') and name[1:].isdigit()]
+    return 'v%04d' % (max(numbers or [0]) + 1)
+
+
+def latest_version(model_dir=DEFAULT_MODEL_DIR):
+    # name of the version to serve, or None if nothing has been trained yet
+    try:
+        with open(os.path.join(model_dir, LATEST)) as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def promote(version, model_dir=DEFAULT_MODEL_DIR):
+    # point LATEST at 'version' (atomically, so a reader never sees an empty file)
+    if not os.path.isdir(os.path.join(model_dir, version)):
+        raise ValueError('no such model version: %s' % version)
+    fd, tmp = tempfile.mkstemp(dir=model_dir, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        f.write(version + '\n')
+    os.replace(tmp, os.path.join(model_dir, LATEST))
+
+
+def save_artifact(model, meta, sample_indices, model_dir=DEFAULT_MODEL_DIR, make_latest=True):
+    # write a new version and (by default) make it the one to serve; returns the version name
+    os.makedirs(model_dir, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=model_dir, prefix='build-')
+    try:
+        with open(os.path.join(tmp_dir, 'model.pkl'), 'wb') as f:
+            pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+        np.save(os.path.join(tmp_dir, 'sample_indices.npy'), np.asarray(sample_indices, dtype=np.int64))
+        scorer = scoring.make_scorer(model)
+        if isinstance(scorer, scoring.LinearScorer):
+            np.savez(os.path.join(tmp_dir, WEIGHTS), coef=scorer.weights, intercept=np.float64(scorer.intercept),
+                     classes=scorer.classes)
+        while True: # two trainers finishing at the same moment must not get the same version number
+            version = _next_version(model_dir)
+            meta = dict(meta, version=version, created=time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()))
+            with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+                json.dump(meta, f, indent=2, sort_keys=True)
+            try:
+                os.rename(tmp_dir, os.path.join(model_dir, version))
+                break
+            except OSError:
+                if not os.path.isdir(os.path.join(model_dir, version)):
+                    raise
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    if make_latest:
+        promote(version, model_dir)
+    return version
+
+
+def load_artifact(version=None, model_dir=DEFAULT_MODEL_DIR):
+    # load 'version' (default: LATEST); returns None when there is nothing to load
+    version = version or latest_version(model_dir)
+    if version is None:
+        return None
+    path = os.path.join(model_dir, version)
+    with instrumentation.timed('model_load'):
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        sample_indices = np.load(os.path.join(path, 'sample_indices.npy'))
+    return Artifact(version, None, meta, sample_indices, path) # the model itself is unpickled on first use
+
+
+class ModelWatcher(object):
+    # hands out the current artifact and hot-swaps to a newer one when LATEST changes.
+    # the check is one stat() at most every 'interval' seconds, so calling current() per request is cheap.
+    def __init__(self, model_dir=DEFAULT_MODEL_DIR, interval=2.0):
+        self.model_dir = model_dir
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._artifact = None
+        self._stamp = None # (mtime_ns, size) of LATEST when we last loaded it
+        self._checked = 0.0
+
+    def _latest_stamp(self):
+        try:
+            st = os.stat(os.path.join(self.model_dir, LATEST))
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def current(self):
+        now = time.monotonic()
+        if self._artifact is not None and now - self._checked < self.interval:
+            return self._artifact
+        with self._lock:
+            self._checked = now
+            stamp = self._latest_stamp()
+            if stamp is not None and stamp != self._stamp:
+                version = latest_version(self.model_dir)
+                if self._artifact is None or version != self._artifact.version:
+                    try:
+                        self._artifact = load_artifact(version, self.model_dir)
+                    except (OSError, ValueError) as e: # a missing or partial version: keep serving the one we have
+                        print('could not load model %s, still serving %s: %s' % (
+                            version, self._artifact.version if self._artifact else 'nothing', e), file=sys.stderr)
+                self._stamp = stamp # not retried until LATEST changes again
+            return self._artifact
@@ -0,0 +1,103 @@
+### fast scoring for the served model
+# a linear SVC decides with sign(x . w + b), so scoring needs nothing but the weight vector:
+# no DataFrame, no sklearn input validation, one matrix-vector product per batch.
+
+# numpy (needed to be installed via pip or the like)
+import numpy as np
+
+CHUNK_ROWS = 16384 # rows converted to float64 at a time when scoring float32 input (~4MB for 30 features)
+
+
+class LinearScorer(object):
+    # label and decision score of a fitted binary linear model (SVC(kernel='linear'), LinearSVC, SGDClassifier, ...)
+    def __init__(self, coef, intercept, classes):
+        self.weights = np.ascontiguousarray(np.asarray(coef, dtype=np.float64).ravel()) # one weight per feature
+        self.intercept = float(np.ravel(intercept)[0])
+        self.classes = np.asarray(classes) # classes[0] when the score is <= 0, classes[1] when it is > 0
+        self._weights_list = self.weights.tolist() # for the single-row path
+
+    @classmethod
+    def from_model(cls, model):
+        coef = model.coef_ # raises AttributeError for non-linear kernels
+        if hasattr(coef, 'toarray'): # models trained on sparse input keep a sparse coef_
+            coef = coef.toarray()
+        if np.shape(coef)[0] != 1:
+            raise ValueError('LinearScorer only handles binary classifiers, got %d weight vectors' % np.shape(coef)[0])
+        return cls(coef, model.intercept_, model.classes_)
+
+    @property
+    def n_features(self):
+        return len(self.weights)
+
+    def decision(self, x):
+        # decision scores for a 2-d array of rows (float32 or float64, any layout)
+        x = np.asarray(x)
+        if x.ndim != 2 or x.shape[1] != self.n_features:
+            raise ValueError('expected rows of %d features, got shape %s' % (self.n_features, x.shape))
+        if x.dtype == np.float64:
+            return x.dot(self.weights) + self.intercept
+        out = np.empty(len(x), dtype=np.float64)
+        for start in range(0, len(x), CHUNK_ROWS): # float64 accumulation like sklearn, without a full-size float64 copy
+            block = np.asarray(x[start:start + CHUNK_ROWS], dtype=np.float64)
+            out[start:start + len(block)] = block.dot(self.weights)
+        out += self.intercept
+        return out
+
+    def labels(self, scores):
+        return self.classes[(np.asarray(scores) > 0).astype(np.intp)]
+
+    def score(self, x):
+        # (labels, decision scores) for a batch of rows
+        scores = self.decision(x)
+        return self.labels(scores), scores
+
+    def score_one(self, row):
+        # (label, decision score) for one transaction given as a sequence of feature values
+        if len(row) != self.n_features:
+            raise ValueError('expected %d features, got %d' % (self.n_features, len(row)))
+        score = self.intercept
+        for w, v in zip(self._weights_list, row): # plain python beats numpy call overhead at 30 features
+            score += w * v
+        return self.classes[1 if score > 0 else 0], score
+
+
+class ModelScorer(object):
+    # same interface for models without a weight vector (e.g. an rbf SVC); just calls into sklearn
+    def __init__(self, model):
+        self.model = model
+        self.classes = np.asarray(model.classes_)
+
+    @property
+    def n_features(self):
+        return self.model.n_features_in_
+
+    def decision(self, x):
+        return self.model.decision_function(np.asarray(x, dtype=np.float64))
+
+    def labels(self, scores):
+        return self.classes[(np.asarray(scores) > 0).astype(np.intp)]
+
+    def score(self, x):
+        scores = self.decision(x)
+        return self.labels(scores), scores
+
+    def score_one(self, row):
+        labels, scores = self.score([row])
+        return labels[0], float(scores[0])
+
+
+def make_scorer(model):
+    # LinearScorer when the model has a usable weight vector, ModelScorer otherwise
+    try:
+        return LinearScorer.from_model(model)
+    except (AttributeError, ValueError):
+        return ModelScorer(model)
+
+
+def disagreements(model, scorer, x, chunk_rows=65536):
+    # number of rows where scorer and model.predict give different labels (should be 0)
+    count = 0
+    for start in range(0, len(x), chunk_rows):
+        block = x[start:start + chunk_rows]
+        count += int((scorer.score(block)[0] != model.predict(np.asarray(block, dtype=np.float64))).sum())
+    return count
@@ -0,0 +1,238 @@
+### low-latency online scoring service
+# single-transaction score requests are coalesced: everything that arrives within 'window' seconds
+# (or until 'max_rows' requests are waiting) is scored with one vectorised call, and every caller
+# gets its own result back. one dot product over 256 rows costs about as much as over 1 row, so
+# under concurrent load this gives far more throughput than one predict per request, while the
+# window caps how much latency the batching can add.
+# usage: python scoring_service.py [--host 127.0.0.1] [--port 8060] [--window-ms 1] [--max-rows 256]
+#   POST /score  {"V1": .., ..., "Amount": .., "hour": ..} (or "Time" instead of "hour", or {"features": [..]})
+#   GET  /stats  latency percentiles, throughput and batch sizes
+
+# argparse, asyncio, collections, json, sys, time (standard library)
+import argparse
+import asyncio
+import collections
+import json
+import sys
+import time
+
+# numpy (needed to be installed via pip or the like)
+import numpy as np
+
+import features
+import model_store
+
+
+class LatencyStats(object):
+    # rolling window of the last 'size' request latencies plus batch sizes and a request counter
+    def __init__(self, size=100000):
+        self.latencies = collections.deque(maxlen=size)
+        self.batch_sizes = collections.deque(maxlen=size)
+        self.requests = 0
+        self.started = time.monotonic()
+
+    def record_batch(self, latencies):
+        self.latencies.extend(latencies)
+        self.batch_sizes.append(len(latencies))
+        self.requests += len(latencies)
+
+    def summary(self):
+        out = {
+            'requests': self.requests,
+            'requests_per_second': self.requests / max(time.monotonic() - self.started, 1e-9),
+        }
+        if self.latencies:
+            p50, p90, p99, p999 = np.percentile(np.asarray(self.latencies) * 1000.0, [50, 90, 99, 99.9])
+            out.update(p50_ms=p50, p90_ms=p90, p99_ms=p99, p999_ms=p999, max_ms=max(self.latencies) * 1000.0,
+                       mean_batch_rows=float(np.mean(self.batch_sizes)))
+        return out
+
+
+class MicroBatcher(object):
+    # coalesces concurrent score() calls into batches; must be used from a single event loop
+    def __init__(self, current_artifact, window=0.001, max_rows=256, stats=None):
+        self.current_artifact = current_artifact # function returning the artifact to score with (e.g. ModelWatcher.current)
+        self.window = window # seconds to wait for more requests after the first one of a batch arrives
+        self.max_rows = max_rows # a batch is scored as soon as this many requests are waiting
+        self.stats = stats or LatencyStats()
+        self._pending = [] # (row, future, arrival time)
+        self._arrived = None # set when the first request of a batch arrives
+        self._full = None # set when max_rows requests are waiting
+        self._task = None
+
+    def start(self):
+        self._arrived = asyncio.Event()
+        self._full = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def score(self, row):
+        # (label, decision score, model version) for one transaction given as a feature sequence
+        if self._task is None:
+            self.start()
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((row, future, time.perf_counter()))
+        self._arrived.set()
+        if len(self._pending) >= self.max_rows:
+            self._full.set()
+        return await future
+
+    async def _run(self):
+        while True:
+            await self._arrived.wait()
+            if self.window > 0 and len(self._pending) < self.max_rows:
+                try:
+                    await asyncio.wait_for(self._full.wait(), self.window)
+                except asyncio.TimeoutError:
+                    pass
+            batch, self._pending = self._pending[:self.max_rows], self._pending[self.max_rows:]
+            self._full.clear()
+            if not self._pending:
+                self._arrived.clear()
+            elif len(self._pending) >= self.max_rows:
+                self._full.set()
+            try:
+                self._score_batch(batch)
+            except Exception as e: # whatever went wrong, the batcher must live on for the next requests
+                self._fail(batch, e)
+            await asyncio.sleep(0) # let the callers of this batch run before the next one is collected
+
+    @staticmethod
+    def _fail(batch, error):
+        for _, future, _ in batch:
+            if not future.done():
+                future.set_exception(error)
+
+    def _score_batch(self, batch):
+        try:
+            artifact = self.current_artifact()
+        except Exception as e: # no model to score with: every request of the batch gets the error
+            self._fail(batch, e)
+            return
+        try:
+            x = np.asarray([row for row, _, _ in batch], dtype=np.float64)
+            labels, scores = artifact.scorer.score(x)
+        except Exception as e: # a malformed row fails the whole batch; retry the rows one by one so only it fails
+            if len(batch) > 1:
+                for item in batch:
+                    self._score_batch([item])
+                return
+            if not batch[0][1].done():
+                batch[0][1].set_exception(e)
+            return
+        done = time.perf_counter()
+        for (_, future, _), label, score in zip(batch, labels.tolist(), scores.tolist()):
+            if not future.done(): # the caller may have given up (e.g. client disconnected)
+                future.set_result((label, score, artifact.version))
+        self.stats.record_batch([done - arrived for _, _, arrived in batch])
+
+
+def row_from_payload(payload, feature_columns):
+    # feature values in model order from {"features": [..]} or {"V1": .., ..}; 'hour' and other
+    # derived features may be given as a raw 'Time' instead. a missing (null) or non-finite value is refused
+    # with a ValueError, as in batch_score.feature_matrix: it would score as 'legit' (NaN > 0 is False)
+    if isinstance(payload, list):
+        values = payload
+    elif 'features' in payload:
+        values = payload['features']
+    else:
+        missing = [col for col in feature_columns if col not in payload]
+        if missing and 'Time' in payload:
+            derived = features.derive(np.asarray([payload['Time']], dtype=np.float64), [c for c in missing if c in features.FEATURES])
+            payload = dict(payload, **dict((name, values[0].item()) for name, values in derived.items()))
+        values = [payload[col] for col in feature_columns]
+    if not isinstance(values, list) or len(values) != len(feature_columns):
+        raise ValueError('expected %d feature values (%s)' % (len(feature_columns), ', '.join(feature_columns)))
+    row = np.asarray(values, dtype=np.float64) # null -> nan, so it is caught below with the rest
+    bad = [col for col, ok in zip(feature_columns, np.isfinite(row)) if not ok]
+    if bad:
+        raise ValueError('missing or non-finite value for %s' % ', '.join(bad))
+    return row.tolist()
+
+
+### minimal HTTP/1.1 front end (keep-alive, Content-Length bodies only) so the service needs nothing beyond the standard library
+class ScoringServer(object):
+    def __init__(self, batcher):
+        self.batcher = batcher
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, version = request_line.decode('latin-1').split(' ', 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+                status, payload = await self.route(method, path, body)
+                data = json.dumps(payload).encode()
+                keep_alive = headers.get('connection', '').lower() != 'close' and not version.startswith('HTTP/1.0')
+                writer.write(b'HTTP/1.1 %d %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\nConnection: %s\r\n\r\n'
+                             % (status, b'OK' if status == 200 else b'Error', len(data), b'keep-alive' if keep_alive else b'close'))
+                writer.write(data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method, path, body):
+        if method == 'GET' and path == '/stats':
+            return 200, self.batcher.stats.summary()
+        if method != 'POST' or path != '/score':
+            return 404, {'error': 'POST /score or GET /stats'}
+        try:
+            row = row_from_payload(json.loads(body), self.batcher.current_artifact().feature_columns)
+            label, score, version = await self.batcher.score(row)
+        except (ValueError, KeyError, TypeError) as e:
+            return 400, {'error': str(e)}
+        return 200, {'prediction': label, 'score': score, 'model_version': version}
+
+
+async def serve(host, port, batcher):
+    batcher.start()
+    server = await asyncio.start_server(ScoringServer(batcher).handle, host, port)
+    print('scoring service on http://%s:%d (window %.2fms, max %d rows)' % (host, port, batcher.window * 1000, batcher.max_rows),
+          file=sys.stderr)
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve single-transaction scoring with request coalescing.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8060)
+    parser.add_argument('--window-ms', type=float, default=1.0, help='how long to wait for more requests before scoring a batch')
+    parser.add_argument('--max-rows', type=int, default=256, help='score a batch as soon as this many requests are waiting')
+    parser.add_argument('--model-dir', default=model_store.DEFAULT_MODEL_DIR, help='artifact directory')
+    args = parser.parse_args(argv)
+
+    watcher = model_store.ModelWatcher(args.model_dir)
+    if watcher.current() is None:
+        parser.error('no trained model in %s, run train_model.py first' % args.model_dir)
+    batcher = MicroBatcher(watcher.current, args.window_ms / 1000.0, args.max_rows)
+    try:
+        asyncio.run(serve(args.host, args.port, batcher))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,183 @@
+### precomputed dashboard statistics and figures
+# everything the Statistics, Heatmap and Predict tabs show is computed once per dataset version
+# (class counts, correlation table, slider ranges) or per dataset + model version (confusion matrix),
+# stored as json next to the dataset cache, and handed to dash as ready-made figure dicts.
+# a new csv or a new model gives a new key, so stale entries are never served; only the newest entry of each
+# kind (data, stream, model) is kept, in memory and on disk, so a nightly stats file or model doesn't pile them up.
+# plotly is only imported to compute a missing entry, not to serve a stored one.
+
+# json, os, tempfile, threading (standard library)
+import json
+import os
+import tempfile
+import threading
+
+# math
+import math
+
+# numpy (needed to be installed via pip or the like)
+import numpy as np
+
+import correlation
+import dataset_cache
+import instrumentation
+from streaming_stats import StreamingStats
+
+STATS_FORMAT = 4 # bump when the content of the stats files changes
+KINDS = ('data', 'stream', 'model') # one stored entry per kind
+
+
+def _figure_dict(figure):
+    # plain json-compatible dict of a plotly figure (what dcc.Graph sends to the browser anyway)
+    return json.loads(figure.to_json())
+
+
+def compute_dataset_stats(summary):
+    # statistics that depend on the data only, from a summary made by correlation.py (exact, parallel or sampled)
+    import plotly.graph_objs as go
+    n_legit, n_fraud = int(summary['class_counts'].get(0, 0)), int(summary['class_counts'].get(1, 0))
+    corr = summary['corr'] # pearson correlation table between every pair of columns
+    ranges = dict((col, [math.floor(lo), math.ceil(hi)]) # slider ranges for the Predict tab
+                  for col, lo, hi in zip(summary['columns'], summary['min'], summary['max']) if col != 'Class')
+    pie = go.Figure( # which is a figure
+        data=[
+            go.Pie( # represented as a pie chart
+                labels=['Legit', 'Fraud'], # contains data which is called 'Legit' and 'Fraud'
+                values=[n_legit, n_fraud] # fill the values with the count of rows in legit and fraud transactions
+            )
+        ],
+        layout=go.Layout( # change some layout properties to this graph (pie chart)
+            title='Legit vs Fraud transaction frequency', # set the graph's title
+            height=600, # change the graph's height
+            width=600 # change the graph's width
+        )
+    )
+    heatmap = go.Figure( # which is a figure
+        data=[
+            go.Heatmap( # represented as a heatmap
+                x=summary['columns'], # x-axis labels
+                y=summary['columns'], # y-axis labels
+                z=corr # assign z-axis value to be a correlation table
+            )
+        ],
+        layout=go.Layout( # change some layout properties to this graph (heatmap)
+            title='Correlation between variables (%s)' % correlation.describe(summary['info']), # set the graph's title, with how it was computed
+            height=800, # change the graph's height
+            width=800 # change the graph's width
+        )
+    )
+    return {
+        'rows': summary['rows'],
+        'class_counts': {'legit': n_legit, 'fraud': n_fraud},
+        'slider_ranges': ranges,
+        'correlation': summary['info'],
+        'figures': {'pie': _figure_dict(pie), 'heatmap': _figure_dict(heatmap)},
+    }
+
+
+def compute_model_stats(dataset, artifact):
+    # statistics that depend on the data (a dataset_cache.Dataset) and the served model
+    import plotly.graph_objs as go
+    if artifact.meta.get('dataset_version') == dataset.version: # computed by train_model.py on this very data
+        cm = np.asarray(artifact.meta['metrics']['confusion_matrix'])
+    else: # the csv changed since the model was trained: predict all the data again, straight from the shared matrix
+        x = dataset.x
+        if artifact.feature_columns != list(dataset.columns): # a model trained on other columns gets just those
+            x = x[:, [dataset.columns.index(col) for col in artifact.feature_columns]]
+        predicted = artifact.scorer.score(x)[0]
+        cm = np.bincount(np.asarray(dataset.y, dtype=np.intp) * 2 + predicted.astype(np.intp), minlength=4).reshape(2, 2) # rows actual, columns predicted
+    accuracy = float(cm[0][0] + cm[1][1]) / cm.sum() * 100 # formula: (true_predictions) / (all_data_count) * 100
+    figure = go.Figure( # which is a figure
+        data=[
+            go.Heatmap(z=cm, # represented as a heatmap; with the z value to the confusion matrix
+                       x=["Predict not fraud", "Predict fraud"], # x-axis labels
+                       y=["Actual not fraud", "Actual fraud"]) # y-axis labels
+        ],
+        layout=go.Layout( # change some layout properties to this graph (heatmap)
+            title='Confusion matrix for SVM', # set the graph's title
+            height=600, # change the graph's height
+            width=600 # change the graph's width
+        )
+    )
+    return {
+        'confusion_matrix': cm.tolist(),
+        'accuracy': accuracy,
+        'figures': {'confusion_matrix': _figure_dict(figure)},
+    }
+
+
+class StatsCache(object):
+    # in-memory and on-disk cache of the two kinds of stats above.
+    # data stats come from 'dataset' (a dataset_cache.Dataset), or, when 'stream_path' names a StreamingStats file
+    # kept up to date by batch_score.py --stats / streaming_stats.py, from that file (re-read whenever it changes)
+    def __init__(self, dataset, current_artifact, cache_dir=dataset_cache.DEFAULT_CACHE_DIR,
+                 stream_path=os.environ.get('FRAUD_STREAM_STATS')):
+        self.data = dataset
+        self.current_artifact = current_artifact # function returning the served artifact (e.g. ModelWatcher.current)
+        self.dataset_version = dataset.version
+        self.stream_path = stream_path
+        self.directory = os.path.join(cache_dir, 'stats')
+        self._memory = {} # kind -> (key, stats) of the newest entry of that kind
+        self._lock = threading.Lock()
+
+    def _get(self, kind, key, compute, stage):
+        key = '%s-s%d-%s' % (kind, STATS_FORMAT, key)
+        entry = self._memory.get(kind)
+        if entry is not None and entry[0] == key:
+            return entry[1]
+        with self._lock: # concurrent first requests compute once
+            entry = self._memory.get(kind)
+            if entry is None or entry[0] != key:
+                stats = self._load(key)
+                if stats is None:
+                    with instrumentation.timed(stage):
+                        stats = self._store(key, compute())
+                    self._evict(kind, key)
+                entry = self._memory[kind] = (key, stats) # replaces the older entry of this kind
+            return entry[1]
+
+    def _load(self, key):
+        try:
+            with open(os.path.join(self.directory, key + '.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _store(self, key, stats):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(stats, f)
+        os.replace(tmp, os.path.join(self.directory, key + '.json'))
+        return stats
+
+    def _evict(self, kind, keep):
+        # remove the files of older entries of 'kind' (and any left by an older STATS_FORMAT)
+        current = tuple('%s-s%d-' % (k, STATS_FORMAT) for k in KINDS)
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json') or name == keep + '.json':
+                continue
+            if name.startswith(kind + '-') or not name.startswith(current):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError: # already gone (another process evicting too)
+                    pass
+
+    def dataset(self):
+        if self.stream_path and os.path.exists(self.stream_path):
+            st = os.stat(self.stream_path)
+            return self._get('stream', '%d-%d' % (st.st_mtime_ns, st.st_size),
+                             lambda: compute_dataset_stats(correlation.summary_of(StreamingStats.load(self.stream_path))),
+                             'stats_dataset')
+        data = self.data
+        mode = correlation.resolve_mode(correlation.DEFAULT_MODE, len(data)) # a different mode, sample size or thread count gives a new entry
+        part = {'sample': 'sample%d' % correlation.SAMPLE_ROWS, 'parallel': 'parallel%d' % correlation.THREADS}.get(mode, mode)
+        return self._get('data', '%s-%s' % (self.dataset_version, part),
+                         lambda: compute_dataset_stats(correlation.summarize(data.x, data.columns, data.y, dataset_cache.FRAME_COLUMNS, mode)),
+                         'stats_dataset')
+
+    def model(self):
+        artifact = self.current_artifact()
+        trained = ''.join(c for c in artifact.meta.get('created', '') if c.isalnum()) # tells apart a version number reused after models/ was wiped
+        return self._get('model', '%s-%s-%s' % (self.dataset_version, artifact.version, trained),
+                         lambda: compute_model_stats(self.data, artifact), 'stats_model')
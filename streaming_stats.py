@@ -0,0 +1,202 @@
+### incremental statistics over chunks of transactions
+# keeps running class counts and, per column, count/min/max/mean plus the full co-moment matrix
+# sum((x - mean)(x - mean)^T). chunks are combined with the pairwise update of Chan, Golub & LeVeque,
+# which stays accurate where the naive sum-of-squares formula cancels catastrophically.
+# memory is O(columns^2) no matter how many rows go through; new data costs O(chunk).
+# usage: python streaming_stats.py creditcard.csv more.csv ... --out stats.json
+
+# argparse, json, os, sys (standard library)
+import argparse
+import json
+import os
+import sys
+
+# numpy (needed to be installed via pip or the like)
+import numpy as np
+
+import features
+
+DEFAULT_CHUNK_ROWS = 100000
+MATRIX_CHUNK_ROWS = 32768 # rows per float64 block when reading an in-memory matrix (~8MB for 31 columns)
+
+
+class StreamingStats(object):
+    def __init__(self, columns):
+        self.columns = list(columns)
+        k = len(self.columns)
+        self.n = 0
+        self.mean = np.zeros(k)
+        self.comoment = np.zeros((k, k)) # sum of (x - mean)(x - mean)^T
+        self.min = np.full(k, np.inf)
+        self.max = np.full(k, -np.inf)
+        self.class_counts = {} # label -> rows
+
+    ### feeding data
+    def update(self, x, labels=None):
+        # add a chunk given as a 2-d array with one column per entry of self.columns
+        x = np.asarray(x, dtype=np.float64)
+        if x.ndim != 2 or x.shape[1] != len(self.columns):
+            raise ValueError('expected rows of %d columns, got shape %s' % (len(self.columns), x.shape))
+        finite = np.isfinite(x)
+        if not finite.all(): # one NaN would poison the running mean and comoment for good: refuse the chunk
+            bad_rows = np.flatnonzero(~finite.all(axis=1))
+            raise ValueError('%d row(s) with a missing or non-finite value (column(s) %s), e.g. row(s) %s of the chunk'
+                             % (len(bad_rows), ', '.join(str(col) for col, ok in zip(self.columns, finite.all(axis=0)) if not ok),
+                                ', '.join(str(row) for row in bad_rows[:5])))
+        if labels is not None:
+            values, counts = np.unique(np.asarray(labels), return_counts=True)
+            for value, count in zip(values.tolist(), counts.tolist()):
+                self.class_counts[value] = self.class_counts.get(value, 0) + count
+        if not len(x):
+            return self
+        chunk = StreamingStats(self.columns)
+        chunk.n = len(x)
+        chunk.mean = x.mean(axis=0)
+        centered = x - chunk.mean
+        chunk.comoment = centered.T.dot(centered)
+        chunk.min = x.min(axis=0)
+        chunk.max = x.max(axis=0)
+        return self._merge_moments(chunk)
+
+    def update_frame(self, frame, chunk_rows=DEFAULT_CHUNK_ROWS):
+        # add a data frame (or a chunk of one); derived features such as 'hour' are computed from a
+        # raw 'Time' column when missing, and 'Class' (if present) feeds the class counts
+        missing = [col for col in self.columns if col not in frame.columns]
+        if missing and 'Time' in frame.columns:
+            frame = frame.assign(**features.derive(frame['Time'].values, [col for col in missing if col in features.FEATURES]))
+            missing = [col for col in self.columns if col not in frame.columns]
+        if missing:
+            raise ValueError('data is missing column(s): %s' % ', '.join(missing))
+        labels = frame['Class'].values if 'Class' in frame.columns else None
+        values = frame[self.columns].values
+        for start in range(0, len(frame), chunk_rows): # bounded float64 temporaries even for a big frame
+            self.update(values[start:start + chunk_rows], None if labels is None else labels[start:start + chunk_rows])
+        return self
+
+    def update_matrix(self, x, columns, labels=None, chunk_rows=MATRIX_CHUNK_ROWS):
+        # add a 2-d array whose columns are named 'columns' (e.g. Dataset.x); a 'Class' column of these
+        # stats is read from 'labels', which also feed the class counts. only one chunk is ever in float64.
+        source = dict((col, i) for i, col in enumerate(columns))
+        missing = [col for col in self.columns if col not in source and not (col == 'Class' and labels is not None)]
+        if missing:
+            raise ValueError('data is missing column(s): %s' % ', '.join(missing))
+        from_x = [(j, source[col]) for j, col in enumerate(self.columns) if col in source]
+        dst, src = np.array([j for j, _ in from_x], dtype=np.intp), np.array([i for _, i in from_x], dtype=np.intp)
+        label_column = self.columns.index('Class') if 'Class' in self.columns and 'Class' not in source else None
+        for start in range(0, len(x), chunk_rows):
+            block = np.empty((min(chunk_rows, len(x) - start), len(self.columns)))
+            block[:, dst] = x[start:start + chunk_rows][:, src]
+            chunk_labels = None if labels is None else labels[start:start + chunk_rows]
+            if label_column is not None:
+                block[:, label_column] = chunk_labels
+            self.update(block, chunk_labels)
+        return self
+
+    def update_csv(self, path, chunk_rows=DEFAULT_CHUNK_ROWS):
+        # stream a csv through update_frame without ever holding the whole file
+        import pandas as pd
+        for chunk in pd.read_csv(path, chunksize=chunk_rows):
+            self.update_frame(chunk, chunk_rows)
+        return self
+
+    def merge(self, other):
+        # fold another StreamingStats over the same columns into this one (e.g. from another process)
+        if other.columns != self.columns:
+            raise ValueError('cannot merge stats over different columns')
+        for value, count in other.class_counts.items():
+            self.class_counts[value] = self.class_counts.get(value, 0) + count
+        return self._merge_moments(other)
+
+    def _merge_moments(self, other):
+        if other.n == 0:
+            return self
+        if self.n == 0:
+            self.n, self.mean, self.comoment = other.n, other.mean.copy(), other.comoment.copy()
+        else:
+            n = self.n + other.n
+            delta = other.mean - self.mean
+            self.mean = self.mean + delta * (float(other.n) / n)
+            self.comoment = self.comoment + other.comoment + np.outer(delta, delta) * (float(self.n) * other.n / n)
+            self.n = n
+        self.min = np.minimum(self.min, other.min)
+        self.max = np.maximum(self.max, other.max)
+        return self
+
+    ### reading results
+    def variance(self, ddof=1):
+        return np.diag(self.comoment) / max(self.n - ddof, 1)
+
+    def std(self, ddof=1):
+        return np.sqrt(self.variance(ddof))
+
+    def covariance(self, ddof=1):
+        return self.comoment / max(self.n - ddof, 1)
+
+    def correlation(self):
+        # pearson correlation matrix; NaN for constant columns, like DataFrame.corr
+        scale = np.sqrt(np.diag(self.comoment))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = self.comoment / np.outer(scale, scale)
+        corr[np.isinf(corr)] = np.nan
+        return np.clip(corr, -1.0, 1.0)
+
+    ### persistence
+    def to_dict(self):
+        return {
+            'columns': self.columns,
+            'n': self.n,
+            'mean': self.mean.tolist(),
+            'comoment': self.comoment.tolist(),
+            'min': self.min.tolist(),
+            'max': self.max.tolist(),
+            'class_counts': [[value, count] for value, count in sorted(self.class_counts.items())],
+        }
+
+    @classmethod
+    def from_dict(cls, payload):
+        stats = cls(payload['columns'])
+        stats.n = payload['n']
+        stats.mean = np.asarray(payload['mean'], dtype=np.float64)
+        stats.comoment = np.asarray(payload['comoment'], dtype=np.float64)
+        stats.min = np.asarray(payload['min'], dtype=np.float64)
+        stats.max = np.asarray(payload['max'], dtype=np.float64)
+        stats.class_counts = dict((value, count) for value, count in payload['class_counts'])
+        return stats
+
+    def save(self, path):
+        # written to a temp file first, so the dashboard never reads half a file
+        tmp = '%s.%d.tmp' % (path, os.getpid())
+        with open(tmp, 'w') as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+def main(argv=None):
+    import dataset_cache
+    parser = argparse.ArgumentParser(description='Accumulate streaming statistics over csv files of transactions.')
+    parser.add_argument('inputs', nargs='+', help='csv files (kaggle layout: Time, V1..V28, Amount, Class)')
+    parser.add_argument('--out', required=True, help='stats file; if it exists the new data is merged into it')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS)
+    args = parser.parse_args(argv)
+
+    try:
+        stats = StreamingStats.load(args.out)
+    except OSError:
+        stats = StreamingStats(dataset_cache.FRAME_COLUMNS)
+    for path in args.inputs:
+        try:
+            stats.update_csv(path, args.chunk_rows)
+        except ValueError as e: # nothing is saved, so the stats file keeps only clean data
+            parser.error('%s: %s' % (path, e))
+    stats.save(args.out)
+    print('%d rows, class counts %s' % (stats.n, stats.class_counts), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
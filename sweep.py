@@ -0,0 +1,252 @@
+### parallel hyperparameter and sampling sweep
+# every candidate (model, C, legit-per-fraud ratio, sample size) is trained on a worker of a process
+# pool and scored against the full data set. the feature matrix lives once in shared memory; workers
+# attach to it instead of each receiving a pickled copy. results go to sweeps/sweep-<time>.json/.csv,
+# and --promote saves the best candidate as a new model version (picked up live by the dashboard).
+# usage: python sweep.py --models svc:linear,svc:rbf,linear_svm,sgd --C 0.01,0.1,1 --ratios 1,5,stratified
+#                        --sizes 600,5000,50000 [--search random --n-iter 20] [--workers N] [--rank-by f1] [--promote]
+
+# argparse, csv, itertools, json, multiprocessing, os, random, sys, time (standard library)
+import argparse
+import csv
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+# numpy (needed to be installed via pip or the like)
+import numpy as np
+
+import dataset_cache
+import model_store
+import scoring
+import train_model
+import training
+
+RANK_METRICS = ('f1', 'recall', 'precision', 'accuracy', 'balanced_accuracy')
+
+
+### candidates
+def grid(models, Cs, ratios, sizes):
+    # every combination (sgd has no C of its own; fit_candidate maps C onto its alpha)
+    return [{'model': m, 'C': c, 'ratio': r, 'size': s} for m, c, r, s in itertools.product(models, Cs, ratios, sizes)]
+
+
+def random_search(models, Cs, ratios, sizes, n_iter, seed):
+    # 'n_iter' draws; C is drawn log-uniformly between the smallest and largest value given
+    rng = random.Random(seed)
+    low, high = np.log10(min(Cs)), np.log10(max(Cs))
+    return [{'model': rng.choice(models), 'C': float(10 ** rng.uniform(low, high)),
+             'ratio': rng.choice(ratios), 'size': rng.choice(sizes)} for _ in range(n_iter)]
+
+
+def drop_duplicates(candidates, fraud_rows, legit_rows):
+    # once the fraud rows run out, a bigger 'size' at the same ratio gives the very same sample (see
+    # training.ratio_indices), as does any stratified 'size' beyond the data; keep the first of such candidates
+    # only. returns (kept, dropped)
+    kept, dropped, seen = [], [], set()
+    for candidate in candidates:
+        if candidate['ratio'] == 'stratified':
+            counts = ('all',) if candidate['size'] >= fraud_rows + legit_rows else (candidate['size'],)
+        else:
+            counts = training.ratio_counts(fraud_rows, legit_rows, candidate['size'], float(candidate['ratio']))
+        key = (candidate['model'], candidate['C'], candidate['ratio']) + tuple(counts)
+        (dropped if key in seen else kept).append(candidate)
+        seen.add(key)
+    return kept, dropped
+
+
+### shared feature matrix
+def share(array):
+    # copy 'array' into a new shared memory block; returns (block, spec a worker can attach with)
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[...] = array
+    return block, (block.name, array.shape, array.dtype.str)
+
+
+def attach(spec):
+    name, shape, dtype = spec
+    block = shared_memory.SharedMemory(name=name)
+    return block, np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+
+
+_worker = {} # shared blocks and arrays of this worker process
+
+
+def _init_worker(x_spec, y_spec, legit_spec, fraud_spec):
+    _worker['x_block'], _worker['x'] = attach(x_spec) # keep the blocks referenced, or the buffers go away
+    _worker['y_block'], _worker['y'] = attach(y_spec)
+    _worker['legit_block'], legit = attach(legit_spec)
+    _worker['fraud_block'], fraud = attach(fraud_spec)
+    _worker['classes'] = (legit, fraud)
+
+
+### one candidate
+def fit_candidate(candidate, x, y, seed, classes=None):
+    # 'classes': the (legit, fraud) row numbers of the data set (see training.class_rows)
+    backend, _, kernel = candidate['model'].partition(':')
+    if candidate['ratio'] == 'stratified':
+        rows = training.stratified_indices(y, candidate['size'], seed, classes)
+    else:
+        rows = training.ratio_indices(y, candidate['size'], float(candidate['ratio']), seed, classes)
+    params = {}
+    if backend == 'svc':
+        params = {'kernel': kernel or 'linear', 'C': candidate['C']}
+    elif backend == 'linear_svm':
+        params = {'C': candidate['C']}
+    elif backend == 'sgd':
+        params = {'alpha': 1.0 / (candidate['C'] * len(rows))} # the usual C <-> alpha correspondence
+    start = time.perf_counter()
+    model = training.fit(backend, x, y, rows, seed, **params)
+    return model, rows, time.perf_counter() - start
+
+
+def metrics_from_confusion(cm):
+    (tn, fp), (fn, tp) = cm
+    recall = float(tp) / max(tp + fn, 1)
+    precision = float(tp) / max(tp + fp, 1)
+    return {
+        'confusion_matrix': [[int(tn), int(fp)], [int(fn), int(tp)]],
+        'accuracy': float(tn + tp) / max(tn + fp + fn + tp, 1),
+        'recall': recall,
+        'precision': precision,
+        'f1': 2 * precision * recall / max(precision + recall, 1e-12),
+        'balanced_accuracy': (recall + float(tn) / max(tn + fp, 1)) / 2,
+    }
+
+
+def evaluate_candidate(candidate, seed, x=None, y=None, classes=None):
+    # train one candidate and score it on every row; runs in a worker (x, y, classes from shared memory) or in-process
+    x = _worker['x'] if x is None else x
+    y = _worker['y'] if y is None else y
+    classes = _worker['classes'] if classes is None else classes
+    try:
+        model, rows, fit_seconds = fit_candidate(candidate, x, y, seed, classes)
+        start = time.perf_counter()
+        predicted = scoring.make_scorer(model).score(x)[0]
+        score_seconds = time.perf_counter() - start
+    except Exception as e: # one bad combination (e.g. a sample too small for a class) must not end the sweep
+        return dict(candidate, error='%s: %s' % (type(e).__name__, e))
+    cm = np.bincount(y.astype(np.intp) * 2 + predicted.astype(np.intp), minlength=4).reshape(2, 2) # rows actual, columns predicted
+    n_fraud = int((y[rows] == 1).sum()) # what was actually trained on: fewer rows than 'size' when the data
+    n_legit = len(rows) - n_fraud # runs out of fraud rows for the ratio
+    return dict(candidate, n_train=len(rows), n_fraud=n_fraud, n_legit=n_legit, train_ratio=float(n_legit) / max(n_fraud, 1),
+                fit_seconds=fit_seconds, score_seconds=score_seconds, **metrics_from_confusion(cm))
+
+
+def run_sweep(candidates, x, y, classes, seed, workers):
+    # evaluate every candidate, across 'workers' processes (0 = in this process); results in completion order
+    results = []
+    if workers <= 0:
+        for candidate in candidates:
+            results.append(evaluate_candidate(candidate, seed, x, y, classes))
+            report_progress(results[-1], len(results), len(candidates))
+        return results
+    blocks, specs = zip(*[share(np.ascontiguousarray(array)) for array in (x, y) + tuple(classes)])
+    try:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=specs) as pool:
+            futures = [pool.submit(evaluate_candidate, candidate, seed) for candidate in candidates]
+            for future in as_completed(futures):
+                results.append(future.result())
+                report_progress(results[-1], len(results), len(candidates))
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+    return results
+
+
+def report_progress(result, done, total):
+    what = '%(model)s C=%(C)g ratio=%(ratio)s size=%(size)d' % result
+    if 'error' in result:
+        print('[%d/%d] %s failed: %s' % (done, total, what, result['error']), file=sys.stderr)
+    else:
+        print('[%d/%d] %s -> recall %.4f precision %.4f f1 %.4f (%d fraud + %d legit rows, fit %.2fs, score %.2fs)'
+              % (done, total, what, result['recall'], result['precision'], result['f1'], result['n_fraud'],
+                 result['n_legit'], result['fit_seconds'], result['score_seconds']), file=sys.stderr)
+
+
+def write_report(results, rank_by, out_dir):
+    # sweeps/sweep-<time>.json with everything, plus a flat .csv ranked by 'rank_by'
+    os.makedirs(out_dir, exist_ok=True)
+    base = os.path.join(out_dir, time.strftime('sweep-%Y%m%d-%H%M%S'))
+    ranked = sorted([r for r in results if 'error' not in r], key=lambda r: r[rank_by], reverse=True)
+    with open(base + '.json', 'w') as f:
+        json.dump({'rank_by': rank_by, 'results': ranked + [r for r in results if 'error' in r]}, f, indent=2)
+    fields = ['model', 'C', 'ratio', 'size', 'n_train', 'n_fraud', 'n_legit', 'train_ratio', 'fit_seconds', 'score_seconds'] + list(RANK_METRICS)
+    with open(base + '.csv', 'w', newline='') as f:
+        writer = csv.DictWriter(f, fields, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(ranked)
+    return base, ranked
+
+
+def promote_winner(winner, dataset, seed, model_dir):
+    # refit the winner in this process (same seed, so the same sample) and save it as the served version
+    model, rows, fit_seconds = fit_candidate(winner, dataset.x, dataset.y, seed, (dataset.legit, dataset.fraud))
+    meta = train_model.describe(model, winner['model'], seed, rows, fit_seconds, list(dataset.columns), dataset.x,
+                                dataset.y, dataset.version)
+    meta['sweep'] = dict((k, winner[k]) for k in ('model', 'C', 'ratio', 'size'))
+    return model_store.save_artifact(model, meta, rows, model_dir)
+
+
+def _number_list(text, kind=float):
+    return [kind(value) for value in text.split(',')]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Sweep models, C, class ratio and sample size in parallel.')
+    parser.add_argument('--models', default='svc:linear,linear_svm,sgd', help='backend[:kernel] list, e.g. svc:linear,svc:rbf,linear_svm,sgd')
+    parser.add_argument('--C', default='0.01,0.1,1,10', help='C values (random search: the range to draw from)')
+    parser.add_argument('--ratios', default='1,5,stratified', help="legit rows per fraud row, or 'stratified' for the natural mix")
+    parser.add_argument('--sizes', default='600,5000,50000', help='training sample sizes')
+    parser.add_argument('--search', choices=('grid', 'random'), default='grid')
+    parser.add_argument('--n-iter', type=int, default=20, help='random search: number of candidates')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='worker processes (0 = run in this process)')
+    parser.add_argument('--rank-by', choices=RANK_METRICS, default='f1')
+    parser.add_argument('--out-dir', default='sweeps')
+    parser.add_argument('--promote', action='store_true', help='save the best candidate as the new served model version')
+    parser.add_argument('--model-dir', default=model_store.DEFAULT_MODEL_DIR)
+    args = parser.parse_args(argv)
+
+    models = args.models.split(',')
+    for model in models:
+        if model.partition(':')[0] not in training.BACKENDS:
+            parser.error('unknown backend in %r (known: %s)' % (model, ', '.join(sorted(training.BACKENDS))))
+    ratios = [r if r == 'stratified' else float(r) for r in args.ratios.split(',')]
+    Cs, sizes = _number_list(args.C), _number_list(args.sizes, int)
+    if args.search == 'grid':
+        candidates = grid(models, Cs, ratios, sizes)
+    else:
+        candidates = random_search(models, Cs, ratios, sizes, args.n_iter, args.seed)
+
+    dataset = dataset_cache.load_dataset()
+    candidates, dropped = drop_duplicates(candidates, len(dataset.fraud), len(dataset.legit))
+    if dropped:
+        print('skipping %d candidate(s) that would train on the same rows as another one (the data runs out of rows for the size): %s'
+              % (len(dropped), ', '.join('%(model)s C=%(C)g ratio=%(ratio)s size=%(size)d' % c for c in dropped)), file=sys.stderr)
+    x, y = dataset.x, dataset.y # copied once, into shared memory, by run_sweep (and so are the class row numbers)
+
+    start = time.perf_counter()
+    results = run_sweep(candidates, x, y, (dataset.legit, dataset.fraud), args.seed, args.workers)
+    base, ranked = write_report(results, args.rank_by, args.out_dir)
+    print('%d candidates in %.1fs with %d workers, report in %s.json/.csv' % (len(candidates), time.perf_counter() - start,
+                                                                             args.workers, base), file=sys.stderr)
+    if not ranked:
+        print('every candidate failed', file=sys.stderr)
+        return 1
+    winner = ranked[0]
+    print('best by %s: %s C=%g ratio=%s size=%d (%s %.4f)' % (args.rank_by, winner['model'], winner['C'], winner['ratio'],
+                                                             winner['size'], args.rank_by, winner[args.rank_by]))
+    if args.promote:
+        print('promoted as %s' % promote_winner(winner, dataset, args.seed, args.model_dir))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
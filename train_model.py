@@ -0,0 +1,113 @@
+### training entry point
+# fits the classifier once, outside the web server, and saves it as a versioned artifact (see model_store.py).
+# usage: python train_model.py [--backend svc|linear_svm|sgd] [--seed N] [--fraud 300] [--legit 300]
+#                              [--sample-size N] [--model-dir models] [--no-promote]
+# 'svc' trains on the balanced --fraud/--legit sample; the linear backends train on a stratified
+# sample of --sample-size rows, or on every row when it is not given (see training.py).
+
+# argparse, random, sys, time (standard library)
+import argparse
+import random
+import sys
+import time
+
+# sklearn (needed to be installed via pip or the like)
+import sklearn
+from sklearn.metrics import confusion_matrix
+
+import dataset_cache
+import model_store
+import scoring
+import training
+
+
+def evaluate(model, x, y):
+    # confusion matrix and the usual rates over the whole data set, scored through the fast path
+    # the app uses; the fast path is checked row by row against model.predict before it is trusted
+    scorer = scoring.make_scorer(model)
+    mismatches = scoring.disagreements(model, scorer, x)
+    if mismatches:
+        raise RuntimeError('%s disagrees with %s.predict on %d rows' % (type(scorer).__name__, type(model).__name__, mismatches))
+    cm = confusion_matrix(y, scorer.score(x)[0], labels=[0, 1])
+    return {
+        'confusion_matrix': cm.tolist(),
+        'accuracy': float(cm[0][0] + cm[1][1]) / cm.sum(), # (true_predictions) / (all_data_count)
+        'recall': float(cm[1][1]) / max(cm[1].sum(), 1), # share of fraud that was caught
+        'precision': float(cm[1][1]) / max(cm[:, 1].sum(), 1), # share of fraud alarms that were fraud
+    }
+
+
+def train(dataset, backend='svc', seed=None, n_fraud=300, n_legit=300, sample_size=None, **params):
+    # fit 'backend' on a sample of 'dataset' (from dataset_cache.load_dataset)
+    # and return (model, meta, sample indices) ready for model_store.save_artifact
+    if seed is None:
+        seed = random.randrange(2 ** 31) # still reproducible: the seed goes into the artifact
+    feature_columns = list(dataset.columns)
+    x, y = dataset.x, dataset.y # the shared float32 matrix and labels; the backends only copy the sampled rows
+    classes = (dataset.legit, dataset.fraud)
+    if backend == 'svc':
+        indices = training.sample_indices(y, seed, n_fraud, n_legit, classes)
+    else:
+        indices = training.stratified_indices(y, sample_size, seed, classes)
+
+    start = time.perf_counter()
+    classifier = training.fit(backend, x, y, indices, seed, **params)
+    fit_seconds = time.perf_counter() - start
+    meta = describe(classifier, backend, seed, indices, fit_seconds, feature_columns, x, y, dataset.version)
+    return classifier, meta, indices
+
+
+def describe(classifier, backend, seed, indices, fit_seconds, feature_columns, x, y, dataset_version=None):
+    # the artifact metadata for a model fitted on rows 'indices' of (x, y)
+    return {
+        'estimator': type(classifier).__name__,
+        'backend': backend,
+        'params': dict((k, v) for k, v in classifier.get_params().items() if isinstance(v, (int, float, str, bool, type(None)))),
+        'seed': seed,
+        'n_fraud': int((y[indices] == 1).sum()),
+        'n_legit': int((y[indices] == 0).sum()),
+        'n_train': len(indices),
+        'fit_seconds': fit_seconds,
+        'feature_columns': feature_columns,
+        'dataset_version': dataset_version or dataset_cache.dataset_version(),
+        'sklearn_version': sklearn.__version__,
+        'metrics': evaluate(classifier, x, y),
+    }
+
+
+def train_and_save(dataset, model_dir=model_store.DEFAULT_MODEL_DIR, promote=True, **kwargs):
+    model, meta, indices = train(dataset, **kwargs)
+    return model_store.save_artifact(model, meta, indices, model_dir, make_latest=promote)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Train the fraud classifier and save it as a new model version.')
+    parser.add_argument('--backend', default='svc', choices=sorted(training.BACKENDS), help='training backend (see training.py)')
+    parser.add_argument('--seed', type=int, default=None, help='random seed for the legit sample (default: random, recorded in the artifact)')
+    parser.add_argument('--fraud', type=int, default=300, help='number of fraud transactions to train on')
+    parser.add_argument('--legit', type=int, default=300, help='number of legit transactions to train on')
+    parser.add_argument('--sample-size', type=int, default=None, help='linear backends: stratified sample size (default: every row)')
+    parser.add_argument('--kernel', default=None, help='svc backend: SVC kernel (default linear)')
+    parser.add_argument('-C', type=float, default=None, help='regularisation parameter C (svc, linear_svm)')
+    parser.add_argument('--model-dir', default=model_store.DEFAULT_MODEL_DIR, help='artifact directory')
+    parser.add_argument('--no-promote', action='store_true', help='save the model without making it the served version')
+    args = parser.parse_args(argv)
+    if args.kernel is not None and args.backend != 'svc':
+        parser.error('--kernel only applies to --backend svc')
+    if args.C is not None and args.backend not in ('svc', 'linear_svm'):
+        parser.error('-C only applies to --backend svc or linear_svm')
+
+    params = dict((name, value) for name, value in [('kernel', args.kernel), ('C', args.C)] if value is not None)
+    dataset = dataset_cache.load_dataset()
+    version = train_and_save(dataset, args.model_dir, promote=not args.no_promote, backend=args.backend, seed=args.seed,
+                             n_fraud=args.fraud, n_legit=args.legit, sample_size=args.sample_size, **params)
+    meta = model_store.load_artifact(version, args.model_dir).meta
+    print('saved %s (%s on %d rows in %.2fs, seed %d, accuracy %.4f%%, recall %.4f%%)%s' % (
+        version, meta['backend'], meta['n_train'], meta['fit_seconds'], meta['seed'],
+        meta['metrics']['accuracy'] * 100, meta['metrics']['recall'] * 100,
+        '' if args.no_promote else ' and promoted it to LATEST'))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,140 @@
+### training backends
+# 'svc'        svm.SVC on a small balanced sample (the original approach; kernel SVC scales worse than linearly in rows)
+# 'linear_svm' liblinear's LinearSVC with balanced class weights; time linear in rows, so it can use the full data
+# 'sgd'        hinge-loss SGDClassifier fed chunk by chunk with partial_fit, so the data never has to fit in memory
+# every backend returns a fitted sklearn classifier whose predict() works on the raw feature matrix; the linear
+# ones are trained on standardised features and the scaling is folded back into coef_/intercept_ afterwards,
+# so scoring.LinearScorer serves them with the same single dot product as the SVC.
+
+# numpy (needed to be installed via pip or the like)
+import numpy as np
+
+# sklearn (needed to be installed via pip or the like)
+from sklearn import svm
+from sklearn.linear_model import SGDClassifier
+
+from streaming_stats import StreamingStats
+
+CHUNK_ROWS = 50000 # rows per partial_fit call / per float64 conversion
+
+
+### sampling
+# every sampler takes the labels and, optionally, 'classes': the (legit, fraud) row numbers stored with the data
+# (dataset_cache.Dataset.legit/.fraud), which saves a scan of every label per call
+def class_rows(labels, classes=None):
+    # (legit, fraud) row numbers
+    if classes is not None:
+        return classes
+    labels = np.asarray(labels)
+    return np.flatnonzero(labels == 0), np.flatnonzero(labels == 1)
+
+
+def sample_indices(labels, seed, n_fraud=300, n_legit=300, classes=None):
+    # the first 'n_fraud' fraud transactions plus a random 'n_legit' legit ones (the original 300/300 sample),
+    # returned as sorted row numbers so the exact sample can be stored next to the model
+    legit, fraud = class_rows(labels, classes)
+    fraud = fraud[:n_fraud]
+    rng = np.random.RandomState(seed)
+    legit = rng.choice(legit, size=min(n_legit, len(legit)), replace=False)
+    return np.sort(np.concatenate([fraud, legit]))
+
+
+def stratified_indices(labels, size, seed, classes=None):
+    # a random sample of 'size' rows with the same class proportions as the data (None = every row)
+    if size is None or size >= len(labels):
+        return np.arange(len(labels))
+    rng = np.random.RandomState(seed)
+    picked = []
+    for rows in class_rows(labels, classes):
+        if not len(rows):
+            continue
+        take = max(1, int(round(len(rows) * float(size) / len(labels)))) # keep at least one row of every class
+        picked.append(rng.choice(rows, size=min(take, len(rows)), replace=False))
+    return np.sort(np.concatenate(picked))
+
+
+def ratio_counts(fraud_rows, legit_rows, size, legit_per_fraud):
+    # (fraud, legit) rows ratio_indices takes from data with that many rows of each class
+    n_fraud = min(fraud_rows, int(round(size / (1.0 + legit_per_fraud))))
+    return n_fraud, min(legit_rows, int(round(n_fraud * legit_per_fraud)))
+
+
+def ratio_indices(labels, size, legit_per_fraud, seed, classes=None):
+    # a random sample of up to 'size' rows with 'legit_per_fraud' legit rows for every fraud row
+    # (1.0 = the balanced 50/50 of the original recipe). the ratio wins over the size: when the data has too few
+    # fraud rows the sample is smaller than 'size' (check len() of the result), never more legit-heavy
+    legit, fraud = class_rows(labels, classes)
+    n_fraud, n_legit = ratio_counts(len(fraud), len(legit), size, legit_per_fraud)
+    rng = np.random.RandomState(seed)
+    return np.sort(np.concatenate([rng.choice(fraud, size=n_fraud, replace=False),
+                                   rng.choice(legit, size=n_legit, replace=False)]))
+
+
+def balanced_class_weights(labels):
+    # n_rows / (n_classes * rows_of_class), what class_weight='balanced' computes
+    values, counts = np.unique(np.asarray(labels), return_counts=True)
+    return dict((value, float(len(labels)) / (len(values) * count)) for value, count in zip(values.tolist(), counts.tolist()))
+
+
+### scaling helpers
+def _column_scale(x, rows):
+    # mean and std of the selected rows, accumulated chunk by chunk (see streaming_stats.py)
+    stats = StreamingStats(range(x.shape[1]))
+    for start in range(0, len(rows), CHUNK_ROWS):
+        stats.update(x[rows[start:start + CHUNK_ROWS]])
+    std = stats.std(ddof=0)
+    std[std == 0] = 1.0
+    return stats.mean, std
+
+
+def _fold_scaling(model, mean, std):
+    # the model was fitted on (x - mean) / std; rewrite it to take x directly
+    coef = model.coef_ / std
+    model.intercept_ = model.intercept_ - coef.dot(mean)
+    model.coef_ = coef
+    return model
+
+
+### backends: fit(x, y, rows, seed, **params) -> fitted classifier
+def fit_svc(x, y, rows, seed, kernel='linear', C=1.0):
+    classifier = svm.SVC(kernel=kernel, C=C) # make a new SVC object with 'linear' kernel
+    classifier.fit(np.asarray(x[rows], dtype=np.float64), y[rows]) # command the computer to study the data with .fit()
+    return classifier
+
+
+def fit_linear_svm(x, y, rows, seed, C=0.01, class_weight='balanced', max_iter=5000):
+    mean, std = _column_scale(x, rows)
+    classifier = svm.LinearSVC(C=C, class_weight=class_weight, dual=False, max_iter=max_iter, random_state=seed)
+    classifier.fit((np.asarray(x[rows], dtype=np.float64) - mean) / std, y[rows]) # liblinear: time linear in rows
+    return _fold_scaling(classifier, mean, std)
+
+
+def fit_sgd(x, y, rows, seed, alpha=1e-4, epochs=5, class_weight='balanced', chunk_rows=CHUNK_ROWS):
+    # mini-batch / out-of-core: every epoch walks the rows in shuffled chunks, one partial_fit per chunk,
+    # so only one chunk is ever converted to float64 (x may be a memory map far bigger than RAM)
+    mean, std = _column_scale(x, rows)
+    if class_weight == 'balanced': # partial_fit can't compute this itself, it never sees all labels at once
+        class_weight = balanced_class_weights(y[rows])
+    classes = np.unique(y[rows])
+    classifier = SGDClassifier(loss='hinge', alpha=alpha, class_weight=class_weight, random_state=seed)
+    rng = np.random.RandomState(seed)
+    for _ in range(epochs):
+        order = rows[rng.permutation(len(rows))]
+        for start in range(0, len(order), chunk_rows):
+            chunk = np.sort(order[start:start + chunk_rows]) # sorted reads are friendlier to a memory map
+            classifier.partial_fit((np.asarray(x[chunk], dtype=np.float64) - mean) / std, y[chunk], classes=classes)
+    return _fold_scaling(classifier, mean, std)
+
+
+BACKENDS = {
+    'svc': fit_svc,
+    'linear_svm': fit_linear_svm,
+    'sgd': fit_sgd,
+}
+
+
+def fit(backend, x, y, rows, seed, **params):
+    # train 'backend' on rows 'rows' of (x, y)
+    if backend not in BACKENDS:
+        raise ValueError('unknown training backend %r (known: %s)' % (backend, ', '.join(sorted(BACKENDS))))
+    return BACKENDS[backend](x, y, np.asarray(rows), seed, **params)
@@ -0,0 +1,101 @@
+### production entry point for gunicorn: gunicorn -c gunicorn.conf.py (the server settings are in that file)
+# the data, the model and the tabs' statistics are loaded once, in the gunicorn master, before any worker is forked
+# (preload_app), and every worker shares them copy-on-write: memory stays roughly flat as workers are added, and
+# every worker serves the same model version. workers don't watch models/LATEST themselves; the master does
+# (watch_models below), loads a new version once and then replaces the workers one at a time.
+
+# gc, os, signal, threading, time (standard library)
+import gc
+import os
+import signal
+import threading
+import time
+
+# the dashboard (see fraud_detection_svc.py)
+import fraud_detection_svc
+
+# versioned model artifacts (see model_store.py)
+import model_store
+
+MODEL_POLL = float(os.environ.get('FRAUD_MODEL_POLL') or 2.0) # seconds between two looks at models/LATEST
+ROLL_TIMEOUT = float(os.environ.get('FRAUD_ROLL_TIMEOUT') or 60.0) # longest wait for one worker to start or stop
+
+_fork_lock = threading.Lock() # held while the master swaps models, so no worker is forked from a half-swapped state
+os.register_at_fork(before=_fork_lock.acquire, after_in_parent=_fork_lock.release, after_in_child=_fork_lock.release)
+
+
+def load_artifact(version=None, model_dir=model_store.DEFAULT_MODEL_DIR):
+    # an artifact with its scorer already built, so the workers inherit it instead of each loading their own
+    artifact = model_store.load_artifact(version, model_dir)
+    if artifact is not None:
+        artifact.scorer
+    return artifact
+
+
+def create_app():
+    # the dashboard with everything loaded and the model pinned to the current LATEST (trained first if there is none)
+    resources = fraud_detection_svc.Resources()
+    artifact = load_artifact(resources.model_watcher.current().version, resources.model_dir)
+    return fraud_detection_svc.create_app(resources.dataset, artifact=artifact, warm=True, model_dir=resources.model_dir)
+
+
+def swap_model(app, version):
+    # serve 'version' from now on: loaded (with its statistics) here, so only workers forked afterwards get it
+    with _fork_lock:
+        artifact = load_artifact(version, app.resources.model_dir)
+        app.resources.serve(artifact)
+        gc.collect() # the master runs with gc disabled (see gunicorn.conf.py); drop what loading left behind
+    return artifact
+
+
+def _wait(done, timeout=ROLL_TIMEOUT):
+    deadline = time.monotonic() + timeout
+    while not done():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.1)
+    return True
+
+
+def roll_workers(arbiter):
+    # replace every running worker with a fresh fork of the master, one at a time and without losing capacity:
+    # TTIN starts one more worker, TTOU then stops the oldest one gracefully (it finishes its requests first)
+    old = set(arbiter.WORKERS.copy())
+    for _ in range(len(old)):
+        running = set(arbiter.WORKERS.copy())
+        os.kill(arbiter.pid, signal.SIGTTIN)
+        if not _wait(lambda: set(arbiter.WORKERS.copy()) - running - old):
+            arbiter.log.warning('rolling reload: no new worker within %ss, stopping an old one anyway', ROLL_TIMEOUT)
+        left = len(old & set(arbiter.WORKERS.copy()))
+        os.kill(arbiter.pid, signal.SIGTTOU)
+        if not _wait(lambda: len(old & set(arbiter.WORKERS.copy())) < left):
+            arbiter.log.warning('rolling reload: an old worker is still running after %ss', ROLL_TIMEOUT)
+
+
+def watch_models(arbiter, app, poll=MODEL_POLL):
+    # master thread: when models/LATEST names another version, load it and roll the workers onto it
+    served = app.resources.current_artifact().version
+    while True:
+        time.sleep(poll)
+        latest = model_store.latest_version(app.resources.model_dir)
+        if latest is None or latest == served:
+            continue
+        arbiter.log.info('model %s -> %s: loading it in the master', served, latest)
+        try:
+            swap_model(app, latest)
+        except Exception:
+            arbiter.log.exception('could not load model %s, still serving %s', latest, served)
+        else:
+            roll_workers(arbiter)
+            arbiter.log.info('every worker now serves model %s', latest)
+        served = latest # a broken version is not retried until LATEST moves on
+
+
+def start_model_watcher(arbiter, app):
+    thread = threading.Thread(target=watch_models, args=(arbiter, app), name='model-watcher', daemon=True)
+    thread.start()
+    return thread
+
+
+app = create_app()
+server = app.server # what gunicorn serves (wsgi_app in gunicorn.conf.py)